@@ -0,0 +1,19 @@
+from rest_framework.filters import BaseFilterBackend
+
+from api.serializers import OrderSearchQuerySerializer
+from orders.search import search_orders
+
+
+class OrderSearchFilter(BaseFilterBackend):
+    """Отбор заказов api/orders по параметрам запроса: ?q= (названия блюд),
+    ?table_number=, ?price_from=, ?price_to=, ?date_from= и ?date_to=.
+    Поиск тот же, что и на странице поиска, но без ранжирования:
+    постраничный вывод курсором упорядочивает заказы по id"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = OrderSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        if not query.validated_data:
+            return queryset
+        return search_orders(queryset, text=query.validated_data.pop('q', None), ranked=False,
+                             **query.validated_data)
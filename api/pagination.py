@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class OrderCursorPagination(CursorPagination):
+    """Постраничный вывод заказов в API по курсору (ключу id).
+
+    Запрос каждой страницы выполняется по индексу первичного ключа,
+    поэтому его стоимость не зависит от глубины просмотра, в отличие
+    от OFFSET. Размер страницы задается параметром ?limit= в пределах
+    ORDERS_API_MAX_PAGE_SIZE. Общее число заказов (count) считается
+    отдельным запросом COUNT(*), который можно отключить параметром ?count=false"""
+    ordering = 'id'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def __init__(self):
+        self.page_size = settings.ORDERS_API_PAGE_SIZE
+        self.max_page_size = settings.ORDERS_API_MAX_PAGE_SIZE
+
+    def include_count(self, request):
+        """Функция определяет, нужно ли считать общее число заказов"""
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in ('0', 'false', 'no')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.include_count(request) else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_data(self, data):
+        """Функция возвращает тело ответа со страницей заказов"""
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return response
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'example': 123},
+            **response_schema['properties'],
+        }
+        return response_schema
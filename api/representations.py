@@ -0,0 +1,49 @@
+from collections import defaultdict
+
+from api.serializers import ItemCreateSerializer, OrderRetrieveSerializer
+from orders.models import Item
+
+# Поля, которые выбираются через values() для быстрого представления заказов
+ORDER_FIELDS = ('id', 'table_number', 'status', 'total_price', 'created_at', 'paid_at', 'version', 'updated_at')
+ITEM_FIELDS = ('id', 'order_id', 'item', 'price', 'quantity', 'menu_item_id')
+
+# Поля сериализаторов используются только для форматирования значений,
+# поэтому JSON совпадает с ответом OrderRetrieveSerializer
+_order_fields = OrderRetrieveSerializer().fields
+_item_fields = ItemCreateSerializer().fields
+
+
+def _format(fields, name, value):
+    return None if value is None else fields[name].to_representation(value)
+
+
+def format_order(order, fields=ORDER_FIELDS):
+    """Функция форматирует поля заказа fields из строки values()
+    так же, как это делает OrderRetrieveSerializer (без блюд)"""
+    return {name: _format(_order_fields, name, order[name]) for name in fields}
+
+
+def order_representations(orders):
+    """Функция строит представления заказов без создания объектов моделей
+    и сериализаторов. orders - строки values(*ORDER_FIELDS); блюда всех
+    заказов выбираются одним запросом values_list и группируются в Python.
+    Возвращает словарь {id заказа: представление} в формате OrderRetrieveSerializer"""
+    items_by_order = defaultdict(list)
+    items = (
+        Item.objects.filter(order_id__in=[order['id'] for order in orders])
+        .order_by('id')
+        .values_list(*ITEM_FIELDS)
+    )
+    for item_id, order_id, item, price, quantity, menu_item_id in items:
+        items_by_order[order_id].append({
+            'id': item_id,
+            'item': item,
+            'price': _format(_item_fields, 'price', price),
+            'quantity': quantity,
+            'menu_item': menu_item_id,
+        })
+
+    return {
+        order['id']: {**format_order(order), 'items': items_by_order[order['id']]}
+        for order in orders
+    }
@@ -1,69 +1,149 @@
+from decimal import Decimal
+
+from django.conf import settings
 from rest_framework import serializers
-from orders.models import Order, Item
+from orders.analytics import GROUPINGS
+from orders.dishes import RANKINGS
+from orders.models import Order, Item, MenuItem
+from orders.periods import validate_period
+from orders.services import build_items, save_order
 
 
 class ItemCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Item
-        fields = ['id', 'item', 'price']
+        fields = ['id', 'item', 'price', 'quantity', 'menu_item']
 
 class ItemRetrieveSerializer(serializers.ModelSerializer):
+    # id передается при редактировании заказа, чтобы обновить существующее блюдо
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Item
-        fields = ['item', 'price']
+        fields = ['id', 'item', 'price', 'quantity']
+
+class StatusField(serializers.ChoiceField):
+    """Поле статуса заказа. Помимо кодов принимает
+    прежние русские названия статусов в любом регистре"""
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=Order.STATUS_CHOICES, **kwargs)
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(Order.normalize_status(str(data)) or data)
+
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = ItemRetrieveSerializer(many=True, required=False)
+    status = StatusField(required=False)
+    # Версия, на основе которой составлены изменения заказа
+    version = serializers.IntegerField(required=False, min_value=1)
 
     class Meta:
         model = Order
-        fields = ['table_number', 'status', 'items']
+        fields = ['table_number', 'status', 'version', 'items']
+
+    def validate_items(self, items):
+        """Функция проверяет, что новые блюда без цены есть в меню:
+        их цена берется из меню. Меню проверяется одним запросом"""
+        names = {item['item'] for item in items if 'price' not in item and 'id' not in item}
+        unknown = names - set(MenuItem.objects.filter(name__in=names).values_list('name', flat=True))
+        if unknown:
+            raise serializers.ValidationError(f'Нет в меню, укажите цену: {", ".join(sorted(unknown))}')
+        return items
+
+    def validate_status(self, status):
+        """Функция проверяет, что переход из текущего статуса
+        редактируемого заказа допустим (Order.ALLOWED_TRANSITIONS)"""
+        if self.instance is not None:
+            error = Order.status_change_error(self.instance.status, status)
+            if error:
+                raise serializers.ValidationError(error)
+        return status
 
     def create(self, validated_data):
         """Функция для создания заказа в рамках API"""
-        items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-
-        total_price = 0
-        for item_data in items_data:
-            item = Item.objects.create(order=order, **item_data)
-            total_price += item.price
-
-        order.total_price = total_price
-        order.save()
-        return order
+        items_data = validated_data.pop('items', [])
+        validated_data.pop('version', None)
+        order = Order(**validated_data)
+        return save_order(order, build_items(order, items_data))
 
     def update(self, instance, validated_data):
-        """Функция для редактирования заказа в рамках API"""
-        items_data = validated_data.pop('items', [])
+        """Функция для редактирования заказа в рамках API.
+        Блюда с id обновляются, без id - создаются, а блюда заказа,
+        не переданные в запросе, удаляются. Если поле items
+        в запросе отсутствует, состав заказа не меняется.
+        Если передана версия version, а заказ с тех пор изменили,
+        save_order вызывает OrderVersionConflict"""
+        items_data = validated_data.pop('items', None)
 
         # Обновляем основные поля заказа
         instance.table_number = validated_data.get('table_number', instance.table_number)
         instance.status = validated_data.get('status', instance.status)
-        instance.save()
-
-        # Сохраняем идентификаторы существующих элементов для последующего удаления
-        existing_item_ids = {item.id for item in instance.items.all()}
-
-        # Обновляем или создаем элементы
-        for item_data in items_data:
-            item_id = item_data.get('id')
-            if item_id and item_id in existing_item_ids:
-                # Обновляем существующий элемент
-                item = Item.objects.get(id=item_id, order=instance)
-                item.item = item_data.get('item', item.item)
-                item.price = item_data.get('price', item.price)
-                item.save()
-                existing_item_ids.remove(item_id)  # Удаляем из множества, так как этот элемент обновлен
-            else:
-                # Создаем новый элемент
-                Item.objects.create(order=instance, **item_data)
-
-        # Удаляем элементы, которые не были обновлены или созданы
-        for item_id in existing_item_ids:
-            Item.objects.filter(id=item_id, order=instance).delete()
-
-        return instance
+        instance.version = validated_data.get('version', instance.version)
+
+        if items_data is None:
+            return save_order(instance)
+        return save_order(instance, build_items(instance, items_data), delete_missing=True)
+
+
+class BatchFilterSerializer(serializers.Serializer):
+    status = StatusField(required=False)
+    table_number = serializers.IntegerField(required=False)
+    id_from = serializers.IntegerField(required=False, min_value=1)
+    id_to = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        """Функция проверяет, что задано хотя бы одно условие отбора"""
+        if not attrs:
+            raise serializers.ValidationError('Необходимо указать хотя бы одно условие отбора')
+        return attrs
+
+
+class BatchSerializer(serializers.Serializer):
+    """Выбор заказов для пакетной операции: списком id или фильтром"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    filter = BatchFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        """Функция проверяет, что заказы выбраны ровно одним способом
+        и что их не больше ORDERS_BATCH_MAX_SIZE (в том числе при отборе фильтром)"""
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError('Необходимо указать либо ids, либо filter')
+        max_size = settings.ORDERS_BATCH_MAX_SIZE
+        if len(attrs.get('ids', [])) > max_size:
+            raise serializers.ValidationError(f'За один запрос можно обработать не более {max_size} заказов')
+        if 'filter' in attrs:
+            attrs['filtered_ids'] = self.filter_order_ids(attrs['filter'], max_size + 1)
+            if len(attrs['filtered_ids']) > max_size:
+                raise serializers.ValidationError(
+                    f'Фильтр отбирает больше {max_size} заказов, уточните условия отбора'
+                )
+        return attrs
+
+    @staticmethod
+    def filter_order_ids(filters, limit):
+        """Функция возвращает не более limit id заказов, отобранных фильтром"""
+        queryset = Order.objects.order_by('id')
+        if 'status' in filters:
+            queryset = queryset.filter(status=filters['status'])
+        if 'table_number' in filters:
+            queryset = queryset.filter(table_number=filters['table_number'])
+        if 'id_from' in filters:
+            queryset = queryset.filter(id__gte=filters['id_from'])
+        if 'id_to' in filters:
+            queryset = queryset.filter(id__lte=filters['id_to'])
+        return list(queryset.values_list('id', flat=True)[:limit])
+
+    def get_order_ids(self):
+        """Функция возвращает id выбранных заказов"""
+        if 'ids' in self.validated_data:
+            return self.validated_data['ids']
+        return self.validated_data['filtered_ids']
+
+
+class BatchStatusSerializer(BatchSerializer):
+    status = StatusField()
 
 
 class OrderRetrieveSerializer(serializers.ModelSerializer):
@@ -71,4 +151,61 @@ class OrderRetrieveSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'table_number', 'status', 'total_price', 'items']
+        fields = ['id', 'table_number', 'status', 'total_price', 'created_at', 'paid_at', 'version', 'updated_at',
+                  'items']
+
+
+class RevenueAnalyticsQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(choices=list(GROUPINGS), default='day')
+
+    def validate(self, attrs):
+        """Функция проверяет, что начало периода не позже его окончания"""
+        validate_period(attrs.get('date_from'), attrs.get('date_to'))
+        return attrs
+
+
+class OrderSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, max_length=100)
+    table_number = serializers.IntegerField(required=False)
+    price_from = serializers.DecimalField(required=False, max_digits=10, decimal_places=2, min_value=Decimal(0))
+    price_to = serializers.DecimalField(required=False, max_digits=10, decimal_places=2, min_value=Decimal(0))
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        """Функция проверяет, что границы диапазонов стоимости и дат не перепутаны"""
+        price_from = attrs.get('price_from')
+        price_to = attrs.get('price_to')
+        if price_from is not None and price_to is not None and price_from > price_to:
+            raise serializers.ValidationError('Нижняя граница стоимости не может быть больше верхней')
+        validate_period(attrs.get('date_from'), attrs.get('date_to'))
+        return attrs
+
+
+class RevenueBucketSerializer(serializers.Serializer):
+    bucket = serializers.ReadOnlyField()
+    total_revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    amount_of_orders = serializers.IntegerField()
+    average_bill = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class DishAnalyticsQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = StatusField(required=False)
+    rank_by = serializers.ChoiceField(choices=list(RANKINGS), default='quantity')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        """Функция проверяет, что начало периода не позже его окончания"""
+        validate_period(attrs.get('date_from'), attrs.get('date_to'))
+        return attrs
+
+
+class DishSalesSerializer(serializers.Serializer):
+    menu_item_id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
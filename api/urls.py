@@ -1,11 +1,25 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import OrderViewSet
+from .views import OrderViewSet, RevenueAnalyticsView, CacheStatsView, InstrumentationReportView, AsyncOrderView, \
+    DishAnalyticsView
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet)
 
 urlpatterns = [
+    path('revenue/analytics/', RevenueAnalyticsView.as_view(), name='api_revenue_analytics'),
+    path('dishes/top/', DishAnalyticsView.as_view(), name='api_dish_analytics'),
+    path('cache/stats/', CacheStatsView.as_view(), name='api_cache_stats'),
+    path('instrumentation/', InstrumentationReportView.as_view(), name='api_instrumentation'),
     path('', include(router.urls))
-]
\ No newline at end of file
+]
+
+if settings.ORDERS_ASYNC_VIEWS:
+    # Чтение заказов обслуживается асинхронным представлением,
+    # остальные запросы оно передает OrderViewSet
+    urlpatterns = [
+        path('orders/', AsyncOrderView.as_view(), name='order-list'),
+        path('orders/<int:pk>/', AsyncOrderView.as_view(), name='order-detail'),
+    ] + urlpatterns
\ No newline at end of file
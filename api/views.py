@@ -1,13 +1,138 @@
+from operator import attrgetter, itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.serializers import OrderCreateSerializer, OrderRetrieveSerializer
+from api.filters import OrderSearchFilter
+from api.pagination import OrderCursorPagination
+from api.representations import order_representations, format_order, ORDER_FIELDS
+from api.serializers import OrderCreateSerializer, OrderRetrieveSerializer, RevenueAnalyticsQuerySerializer, \
+    RevenueBucketSerializer, BatchSerializer, BatchStatusSerializer, DishAnalyticsQuerySerializer, DishSalesSerializer
+from orders.analytics import revenue_breakdown
+from orders.cache import get_order_fragments, get_cache_stats
+from orders.conditional import make_etag, not_modified, set_validators
+from orders.dishes import top_dishes
+from orders.idempotency import idempotent
+from orders.instrumentation import get_report
 from orders.models import Order
+from orders.services import change_status, delete_orders, OrderVersionConflict
 
 
 # Create your views here.
-class OrderViewSet(viewsets.ModelViewSet):
+def _get(order, name):
+    """Функция возвращает поле заказа - объекта модели или строки values()"""
+    return order[name] if isinstance(order, dict) else getattr(order, name)
+
+
+class OrderReadMixin:
+    """Общая логика чтения заказов для OrderViewSet и асинхронного
+    представления AsyncOrderView. Требует атрибут request (запрос DRF)
+    и методы get_queryset и filter_queryset"""
+
+    def use_fast_reads(self):
+        """Функция определяет, строить ли представления заказов быстрым
+        способом через values(). По умолчанию это задается настройкой
+        ORDERS_API_FAST_READS, для отдельного запроса - параметром ?fast=0|1"""
+        fast = self.request.query_params.get('fast')
+        if fast is None:
+            return settings.ORDERS_API_FAST_READS
+        return fast.lower() not in ('0', 'false', 'no')
+
+    def get_requested_fields(self):
+        """Функция возвращает кортеж полей заказа из параметра ?fields=
+        (блюда добавляются также параметром ?include=items)
+        или None, если нужно полное представление заказа"""
+        fields = self.request.query_params.get('fields')
+        include = self.request.query_params.get('include')
+        if include and set(include.split(',')) - {'items'}:
+            raise ValidationError({'include': 'Допустимое значение: items'})
+        if not fields:
+            return None
+
+        fields = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        unknown = set(fields) - set(ORDER_FIELDS) - {'items'}
+        if unknown:
+            raise ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'})
+        if include and 'items' not in fields:
+            fields += ('items',)
+        return fields
+
+    def get_representations(self, orders):
+        """Функция возвращает представления заказов из кэша
+        в том же порядке, в котором переданы заказы.
+        Заказы - объекты модели или строки values() при быстром чтении"""
+        if self.use_fast_reads():
+            key = itemgetter('id')
+            representations = get_order_fragments('api', orders, order_representations,
+                                                   key=key, version=itemgetter('version'))
+        else:
+            key = attrgetter('pk')
+            representations = get_order_fragments('api', orders, self.render_representations, key=key)
+        return [representations[key(order)] for order in orders]
+
+    def get_read_queryset(self, fields):
+        """Функция возвращает набор заказов для чтения: при быстром
+        чтении и при выборе отдельных полей через values() выбираются
+        только нужные поля (id нужен для постраничного вывода)"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if fields is not None and 'items' not in fields:
+            return queryset.values(*dict.fromkeys(('id', 'version', 'updated_at') + fields))
+        if self.use_fast_reads():
+            return queryset.values(*ORDER_FIELDS)
+        return queryset
+
+    def get_sparse_representations(self, orders, fields):
+        """Функция возвращает представления заказов, содержащие только
+        поля fields. Если блюда не запрошены, они не загружаются
+        и кэш не используется: поля форматируются прямо из строк values()"""
+        if 'items' not in fields:
+            return [format_order(order, fields) for order in orders]
+        return [
+            {name: representation[name] for name in fields}
+            for representation in self.get_representations(orders)
+        ]
+
+    def represent(self, orders, fields):
+        if fields is None:
+            return self.get_representations(orders)
+        return self.get_sparse_representations(orders, fields)
+
+    def get_etag(self, orders, *parts):
+        """Функция строит ETag ответа по id и версиям заказов.
+        В него входят также адрес запроса с параметрами и формат
+        ответа, поскольку от них зависит содержимое ответа"""
+        versions = [(_get(order, 'id'), _get(order, 'version')) for order in orders]
+        return make_etag('api', self.request.accepted_renderer.format, self.request.get_full_path(), versions, *parts)
+
+
+@method_decorator(idempotent(), name='dispatch')
+class OrderViewSet(OrderReadMixin, viewsets.ModelViewSet):
 
     queryset = Order.objects.prefetch_related('items').all()
+    pagination_class = OrderCursorPagination
+    filter_backends = [OrderSearchFilter]
+
+    def get_queryset(self):
+        """Функция возвращает набор заказов. При чтении блюда заранее
+        не подгружаются: представления заказов берутся из кэша,
+        а блюда загружаются только для заказов, которых в нем нет"""
+        if self.request.method in SAFE_METHODS:
+            return Order.objects.all()
+        return super().get_queryset()
 
     def get_serializer_class(self):
         """Функция получает метод из запроса и
@@ -16,3 +141,222 @@ class OrderViewSet(viewsets.ModelViewSet):
         if self.request.method in ['POST', 'PUT', 'PATCH']:
             return OrderCreateSerializer
         return OrderRetrieveSerializer
+
+    def render_representations(self, orders):
+        """Функция сериализует заказы, отсутствующие в кэше.
+        Блюда всех этих заказов загружаются одним запросом"""
+        prefetch_related_objects(orders, 'items')
+        serializer = self.get_serializer(orders, many=True)
+        return {order.pk: data for order, data in zip(orders, serializer.data)}
+
+    def list(self, request, *args, **kwargs):
+        """Функция возвращает страницу заказов, собранную
+        из закэшированных представлений или только из выбранных полей.
+        Если страница не изменилась (If-None-Match), возвращается ответ 304
+        без построения представлений и без загрузки блюд"""
+        fields = self.get_requested_fields()
+        queryset = self.get_read_queryset(fields)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            page = list(queryset)
+            etag = self.get_etag(page)
+            response = not_modified(request, etag) or Response(self.represent(page, fields))
+        else:
+            etag = self.get_etag(page, getattr(self.paginator, 'count', None))
+            response = not_modified(request, etag) or self.get_paginated_response(self.represent(page, fields))
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Функция возвращает закэшированное представление заказа
+        или только выбранные поля заказа. Если версия заказа у клиента
+        совпадает с текущей, возвращается ответ 304 без загрузки блюд"""
+        fields = self.get_requested_fields()
+        order = get_object_or_404(self.get_read_queryset(fields), pk=self.kwargs[self.lookup_field])
+        etag = self.get_etag([order])
+        last_modified = _get(order, 'updated_at')
+        response = not_modified(request, etag, last_modified) or Response(self.represent([order], fields)[0])
+        return set_validators(response, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        """Функция изменяет заказ (PUT и PATCH) только в той версии, на основе
+        которой клиент составил изменения: поле version в теле запроса или
+        ETag ответа GET по тому же адресу в заголовке If-Match (без них -
+        версия, прочитанная в этом запросе). Если заказ изменили, возвращается
+        ответ 409 с текущим заказом и его версией: клиент объединяет с ним
+        свои изменения блюд (по id) и повторяет запрос с новой версией"""
+        try:
+            return super().update(request, *args, **kwargs)
+        except OrderVersionConflict as conflict:
+            order = Order.objects.prefetch_related('items').filter(pk=conflict.order_id).first()
+            return Response({
+                'detail': 'Заказ изменили после того, как была прочитана его версия',
+                'version': conflict.current_version,
+                'order': OrderRetrieveSerializer(order).data if order is not None else None,
+            }, status=409)
+
+    def perform_update(self, serializer):
+        """Функция проверяет заголовок If-Match перед сохранением заказа"""
+        if_match = self.request.headers.get('If-Match', '').strip()
+        if if_match and if_match != '*' and 'version' not in serializer.validated_data:
+            order = serializer.instance
+            if self.get_etag([order]) not in [etag.strip() for etag in if_match.split(',')]:
+                raise OrderVersionConflict(order.pk, None, order.version)
+        serializer.save()
+
+    @action(detail=False, methods=['post'], url_path='batch-status')
+    def batch_status(self, request, *args, **kwargs):
+        """Функция переводит выбранные заказы (списком ids или фильтром filter)
+        в статус status одним запросом и возвращает результат для каждого заказа"""
+        serializer = BatchStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        status = serializer.validated_data['status']
+        results = change_status(serializer.get_order_ids(), status)
+        return Response({
+            'status': status,
+            'results': [{'id': order_id, 'result': result} for order_id, result in results.items()],
+        })
+
+    @action(detail=False, methods=['post'], url_path='batch-delete')
+    def batch_delete(self, request, *args, **kwargs):
+        """Функция удаляет выбранные заказы (списком ids или фильтром filter)
+        и возвращает результат для каждого заказа"""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = delete_orders(serializer.get_order_ids())
+        return Response({
+            'results': [{'id': order_id, 'result': result} for order_id, result in results.items()],
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncOrderView(OrderReadMixin, View):
+    """Асинхронное чтение заказов (список и отдельный заказ) для api/orders,
+    которое подключается настройкой ORDERS_ASYNC_VIEWS. Поддерживаются
+    те же параметры и условные запросы, что и в OrderViewSet, а ответ
+    совпадает с ним побайтно. Изменение заказов и чтение без быстрого
+    пути (?fast=0) передаются синхронному OrderViewSet"""
+    list_view = staticmethod(OrderViewSet.as_view({'get': 'list', 'post': 'create'}))
+    detail_view = staticmethod(OrderViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+    }))
+    renderer = JSONRenderer()
+
+    def get_queryset(self):
+        return Order.objects.all()
+
+    def filter_queryset(self, queryset):
+        for backend in OrderViewSet.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    async def delegate(self, request, pk=None):
+        """Функция передает запрос синхронному OrderViewSet"""
+        if pk is None:
+            return await sync_to_async(self.list_view)(request)
+        return await sync_to_async(self.detail_view)(request, pk=pk)
+
+    async def get(self, request, pk=None):
+        self.request = Request(request)
+        self.request.accepted_renderer = self.renderer
+        if not self.use_fast_reads():
+            return await self.delegate(request, pk)
+
+        try:
+            if pk is None:
+                return await self.list(request)
+            return await self.retrieve(request, pk)
+        except APIException as error:
+            detail = error.detail if isinstance(error.detail, (dict, list)) else {'detail': error.detail}
+            return self.render(detail, status=error.status_code)
+
+    async def list(self, request):
+        """Функция возвращает страницу заказов. Общее число заказов
+        и страница выбираются одним переходом в поток базы данных"""
+        fields = self.get_requested_fields()
+        paginator = OrderCursorPagination()
+        page = await sync_to_async(paginator.paginate_queryset)(self.get_read_queryset(fields), self.request)
+        etag = self.get_etag(page, paginator.count)
+        response = not_modified(request, etag)
+        if response is None:
+            representations = await sync_to_async(self.represent)(page, fields)
+            response = self.render(paginator.get_paginated_data(representations))
+        return set_validators(response, etag)
+
+    async def retrieve(self, request, pk):
+        """Функция возвращает заказ, выбранный асинхронным запросом (afirst)"""
+        fields = self.get_requested_fields()
+        order = await self.get_read_queryset(fields).filter(pk=pk).afirst()
+        if order is None:
+            # Сообщение совпадает с ответом get_object_or_404 в OrderViewSet
+            raise NotFound(f'No {Order._meta.object_name} matches the given query.')
+        etag = self.get_etag([order])
+        last_modified = order['updated_at']
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            representations = await sync_to_async(self.represent)([order], fields)
+            response = self.render(representations[0])
+        return set_validators(response, etag, last_modified)
+
+    async def post(self, request, pk=None):
+        return await self.delegate(request, pk)
+
+    put = patch = delete = post
+
+
+class RevenueAnalyticsView(APIView):
+
+    def get(self, request, *args, **kwargs):
+        """Функция возвращает выручку, количество заказов и средний чек
+        по часам, дням или столам за период из параметров запроса
+        date_from, date_to и group_by"""
+        query = RevenueAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        results = revenue_breakdown(params['group_by'], params.get('date_from'), params.get('date_to'))
+        return Response({
+            'group_by': params['group_by'],
+            'results': RevenueBucketSerializer(results, many=True).data,
+        })
+
+
+class DishAnalyticsView(APIView):
+
+    def get(self, request, *args, **kwargs):
+        """Функция возвращает самые продаваемые блюда за период
+        из параметров запроса date_from, date_to и status
+        по количеству порций или выручке (rank_by), не больше limit блюд"""
+        query = DishAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        results = top_dishes(
+            params.get('date_from'), params.get('date_to'), params.get('status'), params['rank_by'], params['limit'],
+        )
+        return Response({
+            'rank_by': params['rank_by'],
+            'results': DishSalesSerializer(results, many=True).data,
+        })
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """Функция возвращает счетчики попаданий и промахов
+        кэша заказов в текущем процессе"""
+        return Response(get_cache_stats())
+
+
+class InstrumentationReportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """Функция возвращает накопленный в текущем процессе отчет
+        о числе SQL-запросов и времени обработки по маршрутам"""
+        return Response(get_report())
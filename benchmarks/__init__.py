@@ -0,0 +1,5 @@
+"""Набор нагрузочных сценариев для приложения кафе.
+
+Запуск: python -m benchmarks run --orders 2000 --items 3 --sqlite --output bench.json
+Сравнение результатов двух прогонов: python -m benchmarks compare old.json new.json
+"""
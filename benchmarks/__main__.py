@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import django
+
+
+def configure(sqlite, sqlite_path=None):
+    """Функция настраивает Django. С флагом --sqlite основная база
+    подменяется на SQLite в памяти, чтобы прогон не требовал PostgreSQL.
+    sqlite_path - файл базы SQLite, если она нужна нескольким процессам"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafe_app.settings')
+    from django.conf import settings
+
+    if sqlite:
+        name = sqlite_path or ':memory:'
+        settings.DATABASES['default'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name, 'TEST': {'NAME': name}}
+    django.setup()
+
+
+@contextmanager
+def seeded_database(args):
+    """Контекстный менеджер создает отдельную тестовую базу,
+    заполняет ее заказами и удаляет после прогона"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from .data import seed
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(orders=args.orders, items_per_order=args.items, random_seed=args.seed)
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def write_result(args, result):
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    print(output)
+
+
+def run_command(args):
+    configure(args.sqlite)
+    from .runner import run
+    from .scenarios import SCENARIOS
+
+    unknown = set(args.scenario or []) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f'Неизвестные сценарии: {", ".join(sorted(unknown))}. Доступны: {", ".join(SCENARIOS)}')
+
+    with seeded_database(args):
+        result = run(args.scenario, requests=args.requests, warmup=args.warmup,
+                     items_per_order=args.items, random_seed=args.seed)
+    write_result(args, result)
+
+
+def serialization_command(args):
+    configure(args.sqlite)
+    from .serialization import run
+
+    with seeded_database(args):
+        result = run(limit=args.limit, repeat=args.repeat)
+    write_result(args, result)
+
+
+def concurrency_command(args):
+    # Сервер работает в отдельном процессе, поэтому SQLite хранится во временном файле
+    sqlite_path = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3') if args.sqlite else None
+    configure(args.sqlite, sqlite_path)
+    from .concurrency import run, PATHS
+
+    unknown = set(args.path or []) - set(PATHS)
+    if unknown:
+        sys.exit(f'Неизвестные запросы: {", ".join(sorted(unknown))}. Доступны: {", ".join(PATHS)}')
+
+    with seeded_database(args):
+        result = run(args.path, requests=args.requests, warmup=args.warmup,
+                     concurrency=args.concurrency, random_seed=args.seed)
+    write_result(args, result)
+
+
+def connections_command(args):
+    # Сервер работает в отдельном процессе, поэтому SQLite хранится во временном файле
+    sqlite_path = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3') if args.sqlite else None
+    configure(args.sqlite, sqlite_path)
+    from .concurrency import PATHS
+    from .connections import run
+
+    unknown = set(args.path or []) - set(PATHS)
+    if unknown:
+        sys.exit(f'Неизвестные запросы: {", ".join(sorted(unknown))}. Доступны: {", ".join(PATHS)}')
+
+    with seeded_database(args):
+        result = run(args.path, requests=args.requests, warmup=args.warmup,
+                     concurrency=args.concurrency, random_seed=args.seed, views=args.views)
+    write_result(args, result)
+
+
+def compare_command(args):
+    from .compare import compare
+
+    with open(args.old, encoding='utf-8') as old, open(args.new, encoding='utf-8') as new:
+        comparison = compare(json.load(old), json.load(new))
+    print(json.dumps(comparison, indent=2, ensure_ascii=False))
+
+
+def add_database_arguments(parser):
+    """Функция добавляет общие параметры тестовой базы и вывода результатов"""
+    parser.add_argument('--orders', type=int, default=1000, help='число заказов в базе')
+    parser.add_argument('--items', type=int, default=3, help='число блюд в заказе')
+    parser.add_argument('--seed', type=int, default=42, help='зерно генератора случайных чисел')
+    parser.add_argument('--sqlite', action='store_true', help='использовать SQLite вместо PostgreSQL')
+    parser.add_argument('--output', help='файл для сохранения результатов в JSON')
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Нагрузочные сценарии приложения кафе')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='выполнить сценарии и вывести результаты в JSON')
+    add_database_arguments(run_parser)
+    run_parser.add_argument('--requests', type=int, default=100, help='число запросов на сценарий')
+    run_parser.add_argument('--warmup', type=int, default=10, help='число прогревочных запросов на сценарий')
+    run_parser.add_argument('--scenario', action='append', help='сценарий для запуска (можно указать несколько раз)')
+    run_parser.set_defaults(handler=run_command)
+
+    serialization_parser = subparsers.add_parser(
+        'serialization', help='сравнить стоимость представления заказа в API: сериализатор DRF и values()',
+    )
+    add_database_arguments(serialization_parser)
+    serialization_parser.add_argument('--limit', type=int, default=500, help='число заказов в одной выборке')
+    serialization_parser.add_argument('--repeat', type=int, default=20, help='число повторов')
+    serialization_parser.set_defaults(handler=serialization_command)
+
+    concurrency_parser = subparsers.add_parser(
+        'concurrency', help='сравнить синхронные и асинхронные представления под uvicorn при высокой параллельности',
+    )
+    add_database_arguments(concurrency_parser)
+    concurrency_parser.add_argument('--requests', type=int, default=1000, help='число запросов на адрес')
+    concurrency_parser.add_argument('--warmup', type=int, default=50, help='число прогревочных запросов на адрес')
+    concurrency_parser.add_argument('--concurrency', type=int, default=64, help='число параллельных соединений')
+    concurrency_parser.add_argument('--path', action='append', help='адрес для проверки (можно указать несколько раз)')
+    concurrency_parser.set_defaults(handler=concurrency_command)
+
+    connections_parser = subparsers.add_parser(
+        'connections', help='сравнить соединение на каждый запрос, постоянные соединения и пул под нагрузкой',
+    )
+    add_database_arguments(connections_parser)
+    connections_parser.add_argument('--requests', type=int, default=1000, help='число запросов на адрес')
+    connections_parser.add_argument('--warmup', type=int, default=50, help='число прогревочных запросов на адрес')
+    connections_parser.add_argument('--concurrency', type=int, default=32, help='число параллельных соединений')
+    connections_parser.add_argument('--path', action='append', help='адрес для проверки (можно указать несколько раз)')
+    connections_parser.add_argument('--views', choices=['sync', 'async'], default='sync',
+                                    help='синхронные или асинхронные представления')
+    connections_parser.set_defaults(handler=connections_command)
+
+    compare_parser = subparsers.add_parser('compare', help='сравнить результаты двух прогонов')
+    compare_parser.add_argument('old', help='JSON с результатами предыдущего прогона')
+    compare_parser.add_argument('new', help='JSON с результатами нового прогона')
+    compare_parser.set_defaults(handler=compare_command)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
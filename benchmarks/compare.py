@@ -0,0 +1,20 @@
+def compare(old, new):
+    """Функция сравнивает результаты двух прогонов и возвращает
+    изменение p95 задержки, пропускной способности и числа запросов
+    к базе по каждому сценарию, присутствующему в обоих прогонах"""
+    comparison = {}
+    for name, new_result in new['scenarios'].items():
+        old_result = old['scenarios'].get(name)
+        if old_result is None:
+            continue
+        old_p95 = old_result['latency_ms']['p95']
+        new_p95 = new_result['latency_ms']['p95']
+        comparison[name] = {
+            'p95_ms': (old_p95, new_p95),
+            'p95_change_percent': round((new_p95 - old_p95) / old_p95 * 100, 1) if old_p95 else None,
+            'throughput_rps': (old_result['throughput_rps'], new_result['throughput_rps']),
+            'queries_per_request': (
+                old_result['queries_per_request']['mean'], new_result['queries_per_request']['mean'],
+            ),
+        }
+    return comparison
@@ -0,0 +1,143 @@
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.db import connection
+
+from orders.models import Order
+from .data import MENU
+from .runner import git_revision, summarize
+
+# Режимы сервера: значение переменной окружения ORDERS_ASYNC_VIEWS
+MODES = {
+    'sync': '0',
+    'async': '1',
+}
+
+# Запросы, на которых сравниваются режимы: имя -> функция, возвращающая адрес
+PATHS = {
+    'index': lambda rng, order_ids: '/',
+    'index_status_filter': lambda rng, order_ids: f'/?status={rng.choice([Order.PENDING, Order.READY, Order.PAID])}',
+    'search': lambda rng, order_ids: f'/search/?id={rng.choice(order_ids)}&status={Order.PAID}',
+    'search_dishes': lambda rng, order_ids: f'/search/?q={quote(rng.choice(MENU)[0])}',
+    'revenue': lambda rng, order_ids: '/revenue/',
+    'api_list': lambda rng, order_ids: '/api/orders/',
+    'api_retrieve': lambda rng, order_ids: f'/api/orders/{rng.choice(order_ids)}/',
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, database=None):
+    """Функция запускает uvicorn с одним рабочим процессом в заданном режиме
+    и ждет, пока сервер начнет принимать соединения. database - настройка
+    базы данных сервера (по умолчанию - текущая)"""
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.server_settings',
+        ORDERS_ASYNC_VIEWS=MODES[mode],
+        BENCHMARK_DATABASE=json.dumps(database or connection.settings_dict, default=str),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'cafe_app.asgi:application',
+         '--host', '127.0.0.1', '--port', str(port), '--workers', '1', '--log-level', 'warning', '--no-access-log'],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('Не удалось запустить uvicorn (установите его: pip install uvicorn)')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('uvicorn не начал принимать соединения за 30 секунд')
+
+
+def load(port, make_path, order_ids, requests, concurrency, random_seed):
+    """Функция выполняет requests запросов в concurrency параллельных
+    соединениях (keep-alive) и возвращает сводку замеров"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(number, count):
+        rng = random.Random(random_seed + number)
+        client = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        own_latencies = []
+        own_errors = 0
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                client.request('GET', make_path(rng, order_ids))
+                response = client.getresponse()
+                response.read()
+                if response.status >= 400:
+                    own_errors += 1
+            except (OSError, http.client.HTTPException):
+                own_errors += 1
+                client.close()
+                client = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            own_latencies.append(time.perf_counter() - start)
+        client.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for number, count in enumerate(per_worker):
+            executor.submit(worker, number, count)
+    return summarize(latencies, [], time.perf_counter() - started, sum(errors))
+
+
+def run(names=None, requests=1000, warmup=50, concurrency=64, random_seed=42):
+    """Функция поочередно запускает сервер в синхронном и асинхронном
+    режимах и сравнивает пропускную способность и задержки
+    на одних и тех же запросах при высокой параллельности"""
+    order_ids = list(Order.objects.values_list('id', flat=True))
+    results = {}
+    for mode in MODES:
+        port = free_port()
+        server = start_server(mode, port)
+        try:
+            results[mode] = {}
+            for name in names or PATHS:
+                load(port, PATHS[name], order_ids, warmup, min(concurrency, warmup) or 1, random_seed)
+                results[mode][name] = load(port, PATHS[name], order_ids, requests, concurrency, random_seed)
+        finally:
+            server.terminate()
+            server.wait()
+
+    results['async_vs_sync_throughput'] = {
+        name: round(results['async'][name]['throughput_rps'] / results['sync'][name]['throughput_rps'], 2)
+        for name in results['sync']
+    }
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'orders': len(order_ids),
+            'requests': requests,
+            'warmup': warmup,
+            'concurrency': concurrency,
+            'server': 'uvicorn, 1 worker',
+        },
+        'results': results,
+    }
@@ -0,0 +1,102 @@
+import copy
+import time
+
+from django.db import connection
+
+from orders.models import Order
+from .concurrency import PATHS, free_port, load, start_server
+from .runner import git_revision, percentile
+
+# Режимы соединений с базой: изменения настройки DATABASES['default'] сервера
+CONNECTION_MODES = {
+    # Новое соединение (подключение и аутентификация) на каждый запрос
+    'per_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    # Постоянное соединение с проверкой перед повторным использованием
+    'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+    # Пул соединений psycopg 3 (только PostgreSQL)
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'pool': {'min_size': 4, 'max_size': 16}},
+}
+
+# Легкие запросы, в которых подключение к базе составляет заметную часть времени
+DEFAULT_PATHS = ['revenue', 'api_retrieve']
+
+
+def supports_pool():
+    """Функция проверяет, что база - PostgreSQL с драйвером psycopg 3"""
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def database_settings(mode):
+    """Функция возвращает настройку текущей базы для режима соединений mode"""
+    database = copy.deepcopy(connection.settings_dict)
+    options = CONNECTION_MODES[mode]
+    database['CONN_MAX_AGE'] = options['CONN_MAX_AGE']
+    database['CONN_HEALTH_CHECKS'] = options['CONN_HEALTH_CHECKS']
+    database['OPTIONS'].pop('pool', None)
+    if 'pool' in options:
+        database['OPTIONS']['pool'] = options['pool']
+    return database
+
+
+def measure_connect(repeat=20):
+    """Функция измеряет время установки нового соединения с базой
+    (без пула), которое экономят постоянные соединения и пул"""
+    timings = []
+    for _ in range(repeat):
+        wrapper = connection.copy()
+        wrapper.settings_dict['OPTIONS'].pop('pool', None)
+        start = time.perf_counter()
+        wrapper.connect()
+        timings.append(time.perf_counter() - start)
+        wrapper.close()
+    timings.sort()
+    return {
+        'mean': round(sum(timings) / len(timings) * 1000, 3),
+        'p50': round(percentile(timings, 50) * 1000, 3),
+        'max': round(timings[-1] * 1000, 3),
+    }
+
+
+def run(names=None, requests=1000, warmup=50, concurrency=32, random_seed=42, views='sync'):
+    """Функция поочередно запускает сервер с соединением на каждый запрос,
+    с постоянными соединениями и с пулом соединений (если он доступен)
+    и сравнивает пропускную способность на одних и тех же запросах"""
+    order_ids = list(Order.objects.values_list('id', flat=True))
+    modes = [mode for mode in CONNECTION_MODES if mode != 'pool' or supports_pool()]
+    results = {}
+    for mode in modes:
+        port = free_port()
+        server = start_server(views, port, database_settings(mode))
+        try:
+            results[mode] = {}
+            for name in names or DEFAULT_PATHS:
+                load(port, PATHS[name], order_ids, warmup, min(concurrency, warmup) or 1, random_seed)
+                results[mode][name] = load(port, PATHS[name], order_ids, requests, concurrency, random_seed)
+        finally:
+            server.terminate()
+            server.wait()
+
+    results['speedup_vs_per_request'] = {
+        mode: {
+            name: round(results[mode][name]['throughput_rps'] / results['per_request'][name]['throughput_rps'], 2)
+            for name in results['per_request']
+        }
+        for mode in modes if mode != 'per_request'
+    }
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'orders': len(order_ids),
+            'requests': requests,
+            'warmup': warmup,
+            'concurrency': concurrency,
+            'views': views,
+            'server': 'uvicorn, 1 worker',
+            'connect_ms': measure_connect(),
+        },
+        'results': results,
+    }
@@ -0,0 +1,80 @@
+import random
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, Item, MenuItem
+from orders.dishes import rebuild_dish_sales
+from orders.revenue import rebuild_revenue_summary
+
+# Блюда меню с ценами, из которых составляются заказы
+MENU = [
+    ('кофе', Decimal('150.00')),
+    ('латте', Decimal('220.00')),
+    ('капучино', Decimal('200.00')),
+    ('чай', Decimal('120.00')),
+    ('борщ', Decimal('350.00')),
+    ('пельмени', Decimal('420.00')),
+    ('блины', Decimal('280.00')),
+    ('салат цезарь', Decimal('390.00')),
+    ('сырники', Decimal('310.00')),
+    ('чизкейк', Decimal('260.00')),
+]
+
+# Доли заказов в каждом статусе: большая часть истории - оплаченные заказы
+STATUS_WEIGHTS = {
+    Order.PENDING: 0.15,
+    Order.READY: 0.10,
+    Order.PAID: 0.75,
+}
+
+TABLES = range(1, 21)
+
+
+def random_items(rng, count):
+    """Функция возвращает список данных блюд для одного заказа
+    из count порций: повторяющиеся блюда объединяются в одно с количеством"""
+    portions = Counter(rng.choices(MENU, k=count))
+    return [{'item': name, 'price': price, 'quantity': quantity} for (name, price), quantity in portions.items()]
+
+
+def seed(orders=1000, items_per_order=3, days=30, batch_size=1000, random_seed=42):
+    """Функция заполняет базу заказами с блюдами. Столы, статусы и время
+    создания выбираются случайно, но воспроизводимо для одного random_seed.
+    Заказы и блюда создаются пакетами через bulk_create"""
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+
+    with transaction.atomic():
+        MenuItem.objects.bulk_create([MenuItem(name=name, price=price) for name, price in MENU], ignore_conflicts=True)
+        menu = {menu_item.name: menu_item for menu_item in MenuItem.objects.filter(name__in=[name for name, _ in MENU])}
+        for start in range(0, orders, batch_size):
+            batch = []
+            batch_items = []
+            for _ in range(min(batch_size, orders - start)):
+                items = random_items(rng, items_per_order)
+                created_at = now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+                status = rng.choices(statuses, weights)[0]
+                batch.append(Order(
+                    table_number=rng.choice(TABLES),
+                    status=status,
+                    total_price=sum(item['price'] * item['quantity'] for item in items),
+                    created_at=created_at,
+                    paid_at=created_at + timedelta(minutes=rng.randint(10, 90)) if status == Order.PAID else None,
+                ))
+                batch_items.append(items)
+
+            Order.objects.bulk_create(batch)
+            Item.objects.bulk_create([
+                Item(order=order, menu_item=menu[item['item']], **item)
+                for order, items in zip(batch, batch_items)
+                for item in items
+            ])
+
+        rebuild_revenue_summary()
+        rebuild_dish_sales()
@@ -0,0 +1,101 @@
+import math
+import platform
+import subprocess
+import time
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .scenarios import SCENARIOS, Context
+
+
+def percentile(values, percent):
+    """Функция возвращает перцентиль отсортированного списка методом ближайшего ранга"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies, queries, elapsed, errors):
+    """Функция сводит замеры одного сценария в словарь с пропускной
+    способностью, перцентилями задержки и числом запросов к базе
+    (если оно известно, иначе queries - пустой список)"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    summary = {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / count * 1000, 3),
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+    }
+    if queries:
+        summary['queries_per_request'] = {
+            'mean': round(sum(queries) / count, 2),
+            'max': max(queries),
+        }
+    return summary
+
+
+def run_scenario(func, client, context, requests=100, warmup=10):
+    """Функция выполняет сценарий заданное число раз после прогрева
+    и возвращает сводку замеров"""
+    for _ in range(warmup):
+        func(client, context)
+
+    latencies = []
+    queries = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = func(client, context)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(latencies, queries, time.perf_counter() - started, errors)
+
+
+def git_revision():
+    """Функция возвращает текущий коммит, чтобы результаты
+    можно было сопоставлять между версиями кода"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, requests=100, warmup=10, items_per_order=3, random_seed=42):
+    """Функция выполняет выбранные сценарии (по умолчанию все)
+    и возвращает результаты вместе со сведениями об окружении"""
+    client = Client()
+    context = Context(items_per_order=items_per_order, random_seed=random_seed)
+    results = {}
+    for name in names or SCENARIOS:
+        results[name] = run_scenario(SCENARIOS[name], client, context, requests=requests, warmup=warmup)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'orders': len(context.order_ids),
+            'items_per_order': items_per_order,
+            'requests': requests,
+            'warmup': warmup,
+        },
+        'scenarios': results,
+    }
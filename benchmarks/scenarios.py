@@ -0,0 +1,117 @@
+import random
+
+from django.urls import reverse
+
+from orders.models import Order
+from .data import MENU, TABLES, random_items
+
+# Зарегистрированные сценарии: имя -> функция, выполняющая один запрос
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Декоратор регистрирует функцию как сценарий нагрузки.
+    Функция получает клиент и контекст прогона и возвращает ответ"""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+class Context:
+    """Общие для сценариев данные: генератор случайных чисел,
+    размер заказа и id существующих заказов"""
+
+    def __init__(self, items_per_order=3, random_seed=42):
+        self.rng = random.Random(random_seed)
+        self.items_per_order = items_per_order
+        self.order_ids = list(Order.objects.values_list('id', flat=True))
+        # Последние полученные ETag заказов для сценариев с условными запросами
+        self.etags = {}
+
+    def order_id(self):
+        return self.rng.choice(self.order_ids)
+
+    def items(self):
+        return [{'item': item['item'], 'price': str(item['price']), 'quantity': item['quantity']}
+                for item in random_items(self.rng, self.items_per_order)]
+
+
+@scenario('index')
+def index(client, context):
+    return client.get(reverse('index'))
+
+
+@scenario('index_status_filter')
+def index_status_filter(client, context):
+    status = context.rng.choice([Order.PENDING, Order.READY, Order.PAID])
+    return client.get(reverse('index'), {'status': status})
+
+
+@scenario('order_details')
+def order_details(client, context):
+    return client.get(reverse('order_details', args=[context.order_id()]))
+
+
+@scenario('search')
+def search(client, context):
+    return client.get(reverse('search_orders'), {'id': context.order_id(), 'status': Order.PAID})
+
+
+@scenario('search_dishes')
+def search_dishes(client, context):
+    dish, price = context.rng.choice(MENU)
+    return client.get(reverse('search_orders'), {'q': dish, 'price_from': price})
+
+
+@scenario('revenue')
+def revenue(client, context):
+    return client.get(reverse('revenue'))
+
+
+@scenario('revenue_analytics')
+def revenue_analytics(client, context):
+    return client.get(reverse('api_revenue_analytics'), {'group_by': 'day'})
+
+
+@scenario('api_list')
+def api_list(client, context):
+    return client.get(reverse('order-list'))
+
+
+@scenario('api_search')
+def api_search(client, context):
+    dish = context.rng.choice(MENU)[0]
+    return client.get(reverse('order-list'), {'q': dish, 'table_number': context.rng.choice(TABLES)})
+
+
+@scenario('api_list_sparse')
+def api_list_sparse(client, context):
+    return client.get(reverse('order-list'), {'fields': 'id,status,total_price', 'count': 'false'})
+
+
+@scenario('api_retrieve')
+def api_retrieve(client, context):
+    return client.get(reverse('order-detail', args=[context.order_id()]))
+
+
+@scenario('api_retrieve_conditional')
+def api_retrieve_conditional(client, context):
+    # Клиент опрашивает заказ повторно, передавая ETag предыдущего ответа
+    order_id = context.order_id()
+    headers = {'If-None-Match': context.etags[order_id]} if order_id in context.etags else {}
+    response = client.get(reverse('order-detail', args=[order_id]), headers=headers)
+    context.etags[order_id] = response['ETag']
+    return response
+
+
+@scenario('api_create')
+def api_create(client, context):
+    data = {'table_number': context.rng.randint(1, 20), 'items': context.items()}
+    return client.post(reverse('order-list'), data, content_type='application/json')
+
+
+@scenario('api_update')
+def api_update(client, context):
+    data = {'status': Order.READY, 'items': context.items()}
+    return client.patch(reverse('order-detail', args=[context.order_id()]), data, content_type='application/json')
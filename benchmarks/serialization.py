@@ -0,0 +1,48 @@
+import time
+
+from api.representations import order_representations, ORDER_FIELDS
+from api.serializers import OrderRetrieveSerializer
+from orders.models import Order
+
+
+def serializer_path(limit):
+    """Представления через объекты моделей и OrderRetrieveSerializer"""
+    orders = list(Order.objects.order_by('id').prefetch_related('items')[:limit])
+    return OrderRetrieveSerializer(orders, many=True).data
+
+
+def fast_path(limit):
+    """Представления через values() и группировку блюд в Python"""
+    orders = list(Order.objects.order_by('id').values(*ORDER_FIELDS)[:limit])
+    return list(order_representations(orders).values())
+
+
+PATHS = {
+    'serializer': serializer_path,
+    'values': fast_path,
+}
+
+
+def run(limit=500, repeat=20):
+    """Функция сравнивает стоимость построения представления одного заказа
+    (вместе с запросами к базе) для сериализатора DRF и для быстрого пути.
+    Кэш не используется. Время указано в микросекундах на заказ"""
+    results = {}
+    for name, path in PATHS.items():
+        path(limit)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(path(limit))
+            timings.append((time.perf_counter() - start) / max(count, 1))
+        timings.sort()
+        results[name] = {
+            'orders': count,
+            'per_order_us_median': round(timings[len(timings) // 2] * 1_000_000, 2),
+            'per_order_us_min': round(timings[0] * 1_000_000, 2),
+        }
+
+    results['speedup'] = round(
+        results['serializer']['per_order_us_median'] / results['values']['per_order_us_median'], 2,
+    )
+    return results
@@ -0,0 +1,14 @@
+"""Настройки сервера, который запускает сравнение синхронных
+и асинхронных представлений (python -m benchmarks concurrency).
+База данных передается запускающим процессом в переменной окружения"""
+import json
+import os
+
+from cafe_app.settings import *  # noqa: F401,F403
+from cafe_app.settings import DATABASES
+
+if os.environ.get('BENCHMARK_DATABASE'):
+    DATABASES['default'] = json.loads(os.environ['BENCHMARK_DATABASE'])
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafe_app.settings')
+# Настройки баз данных под ASGI по умолчанию отключают постоянные соединения
+os.environ.setdefault('ASGI', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,125 @@
+"""Настройка подключения к базе данных из переменных окружения.
+
+Переменные (префикс DB_ для основной базы):
+    DB_ENGINE               postgresql (по умолчанию) или sqlite
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+                            параметры подключения; для SQLite DB_NAME - путь к файлу
+    DB_CONN_MAX_AGE         время жизни постоянного соединения в секундах
+                            (0 - соединение на каждый запрос), по умолчанию 60,
+                            а при запуске через ASGI - 0
+    DB_CONN_HEALTH_CHECKS   проверять ли постоянное соединение перед
+                            повторным использованием, по умолчанию да
+    DB_CONNECT_TIMEOUT      время ожидания подключения в секундах
+    DB_POOL                 использовать пул соединений psycopg 3 (OPTIONS['pool']);
+                            постоянные соединения при этом отключаются
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+                            размеры пула и время ожидания свободного соединения
+    DB_REPLICAS             имена реплик для чтения через запятую, например replica1,replica2
+    ASGI                    приложение запущено через ASGI (задается в cafe_app/asgi.py)
+
+Реплика replica1 настраивается теми же переменными с префиксом DB_REPLICA1_
+(DB_REPLICA1_HOST и т.д.); не заданные для реплики значения берутся у основной базы.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+
+
+def env_bool(env, name, default=False):
+    value = env.get(name)
+    if value is None or value == '':
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def conn_max_age(env, prefix):
+    """Функция возвращает время жизни постоянного соединения. Под ASGI
+    синхронный код запросов выполняется в разных потоках, и постоянные
+    соединения не переиспользуются, а накапливаются, поэтому по умолчанию
+    они отключаются (для переиспользования соединений служит пул DB_POOL)"""
+    return env_int(env, f'{prefix}CONN_MAX_AGE', 0 if env_bool(env, 'ASGI') else 60)
+
+
+def postgresql_config(env, prefix):
+    """Функция возвращает настройку PostgreSQL с постоянными
+    соединениями или пулом соединений psycopg 3"""
+    config = {
+        'ENGINE': ENGINES['postgresql'],
+        'NAME': env.get(f'{prefix}NAME', 'cafe'),
+        'USER': env.get(f'{prefix}USER', 'postgres'),
+        'PASSWORD': env.get(f'{prefix}PASSWORD', 'postgres'),
+        'HOST': env.get(f'{prefix}HOST', 'localhost'),
+        'PORT': env.get(f'{prefix}PORT', '5432'),
+        'CONN_MAX_AGE': conn_max_age(env, prefix),
+        'CONN_HEALTH_CHECKS': env_bool(env, f'{prefix}CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'connect_timeout': env_int(env, f'{prefix}CONNECT_TIMEOUT', 5),
+        },
+    }
+    if env_bool(env, f'{prefix}POOL'):
+        # Соединения выдает пул, поэтому Django не должен держать
+        # свои постоянные соединения (иначе ImproperlyConfigured)
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': env_int(env, f'{prefix}POOL_MIN_SIZE', 2),
+            'max_size': env_int(env, f'{prefix}POOL_MAX_SIZE', 10),
+            'timeout': env_int(env, f'{prefix}POOL_TIMEOUT', 10),
+        }
+    return config
+
+
+def sqlite_config(env, prefix, base_dir):
+    """Функция возвращает настройку SQLite для локальной разработки
+    и нагрузочных тестов: журнал WAL позволяет читать параллельно
+    с записью, а транзакции IMMEDIATE сразу ждут блокировку записи
+    вместо ошибки 'database is locked' посреди транзакции"""
+    return {
+        'ENGINE': ENGINES['sqlite'],
+        'NAME': env.get(f'{prefix}NAME') or str(base_dir / 'db.sqlite3'),
+        'CONN_MAX_AGE': conn_max_age(env, prefix),
+        'CONN_HEALTH_CHECKS': env_bool(env, f'{prefix}CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'timeout': env_int(env, f'{prefix}CONNECT_TIMEOUT', 20),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    }
+
+
+def database_config(base_dir, prefix='DB_', env=None):
+    """Функция строит настройку одной базы данных для DATABASES
+    из переменных окружения с префиксом prefix"""
+    env = os.environ if env is None else env
+    engine = env.get(f'{prefix}ENGINE', 'postgresql')
+    if engine == 'sqlite':
+        return sqlite_config(env, prefix, base_dir)
+    if engine == 'postgresql':
+        return postgresql_config(env, prefix)
+    raise ImproperlyConfigured(f'Неизвестное значение {prefix}ENGINE: {engine} (допустимо: {", ".join(ENGINES)})')
+
+
+def replica_databases(base_dir, env=None):
+    """Функция строит настройки реплик для чтения, перечисленных
+    в DB_REPLICAS. В тестах реплики указывают на тестовую основную базу"""
+    env = os.environ if env is None else env
+    replicas = {}
+    for alias in filter(None, (name.strip() for name in env.get('DB_REPLICAS', '').split(','))):
+        prefix = f'DB_{alias.upper()}_'
+        # Значения основной базы служат значениями по умолчанию для реплики
+        replica_env = {prefix + name[len('DB_'):]: value for name, value in env.items() if name.startswith('DB_')}
+        replica_env['ASGI'] = env.get('ASGI', '')
+        replica_env.update({name: value for name, value in env.items() if name.startswith(prefix)})
+        config = database_config(base_dir, prefix=prefix, env=replica_env)
+        config['TEST'] = {'MIRROR': 'default'}
+        replicas[alias] = config
+    return replicas
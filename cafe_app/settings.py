@@ -9,9 +9,11 @@ https://docs.djangoproject.com/en/5.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
-import psycopg2
+import os
 from pathlib import Path
 
+from cafe_app.database import database_config, replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'orders.instrumentation.QueryInstrumentationMiddleware',
+    'orders.routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,14 +82,33 @@ WSGI_APPLICATION = 'cafe_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Параметры подключения задаются переменными окружения DB_* (см. cafe_app/database.py):
+# по умолчанию PostgreSQL с постоянными соединениями (при запуске через ASGI
+# постоянные соединения по умолчанию отключены), DB_POOL=1 включает
+# пул соединений psycopg 3, DB_ENGINE=sqlite - базу SQLite для локальной работы.
+# DB_REPLICAS перечисляет реплики, на которые уходят чтения (orders.routing)
+
 DATABASES = {
+    'default': database_config(BASE_DIR),
+    **replica_databases(BASE_DIR),
+}
+
+# Реплики для чтения (все базы, кроме основной)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['orders.routing.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Локально используется кэш в памяти процесса (или файловый кэш),
+# в продакшене - общий для всех процессов, например
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': 'cafe',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cafe'),
     }
 }
 
@@ -138,4 +161,75 @@ AUTH_USER_MODEL = "orders.User"
 #REST framework
 
 REST_FRAMEWORK = {'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-                  'PAGE_SIZE': 3}
\ No newline at end of file
+                  'PAGE_SIZE': 3}
+
+#Orders
+
+# Размер страницы списка заказов по умолчанию и максимальный размер,
+# который можно запросить параметром ?limit=
+ORDERS_PAGE_SIZE = 20
+ORDERS_MAX_PAGE_SIZE = 100
+
+# Строить ли представления заказов в API через values() без сериализаторов DRF.
+# Для отдельного запроса переключается параметром ?fast=0|1
+ORDERS_API_FAST_READS = True
+
+# Размер страницы списка заказов в API по умолчанию и максимальный размер,
+# который можно запросить параметром ?limit=
+ORDERS_API_PAGE_SIZE = 50
+ORDERS_API_MAX_PAGE_SIZE = 500
+
+# Максимальное число заказов в одной пакетной операции API
+ORDERS_BATCH_MAX_SIZE = 1000
+
+# Число заказов, которое выгрузка читает из базы за один раз
+ORDERS_EXPORT_CHUNK_SIZE = 2000
+
+# Оплаченные заказы старше этого числа дней переносятся в архивные таблицы
+# командой archive_orders, а число заказов переносится за одну транзакцию
+ORDERS_ARCHIVE_AFTER_DAYS = 30
+ORDERS_ARCHIVE_BATCH_SIZE = 500
+
+# Время хранения ответов на запросы с ключом идемпотентности, в секундах.
+# Устаревшие ключи удаляет команда purge_idempotency_keys
+ORDERS_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Обслуживать ли главную страницу, поиск, выручку и чтение api/orders
+# асинхронными представлениями (имеет смысл при запуске через ASGI)
+ORDERS_ASYNC_VIEWS = os.environ.get('ORDERS_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Брокер событий заказов для потока events/ (Server-Sent Events).
+# Брокер в памяти доставляет события только в пределах одного процесса
+ORDERS_EVENTS_BROKER = 'orders.events.InProcessBroker'
+# Максимальное число недоставленных событий одного подписчика
+ORDERS_EVENTS_QUEUE_SIZE = 100
+# Интервал отправки пустого комментария при отсутствии событий, в секундах
+ORDERS_EVENTS_HEARTBEAT = 15
+# Пауза перед переподключением клиента после обрыва соединения, в миллисекундах
+ORDERS_EVENTS_RETRY_MS = 3000
+
+# Время хранения закэшированных карточек и представлений заказов, в секундах.
+# Фрагменты сбрасываются сразу при изменении заказа, поэтому срок можно делать большим
+ORDERS_CACHE_TIMEOUT = 60 * 60
+
+# Время в секундах, в течение которого после изменяющего запроса (POST, PATCH...)
+# клиент читает с основной базы, чтобы видеть свои изменения несмотря
+# на отставание реплик
+ORDERS_PRIMARY_PIN_SECONDS = 5
+# Cookie, которым клиент закрепляется за основной базой
+ORDERS_PRIMARY_PIN_COOKIE = 'orders_primary'
+
+# Порог в миллисекундах, начиная с которого SQL-запрос
+# записывается в журнал как медленный вместе с именем маршрута
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'orders': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
@@ -1,8 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Order, Item
+from .models import User, Order, Item, MenuItem, DishSales, RevenueSummary, ArchivedOrder, ArchivedItem, \
+    IdempotencyKey
 
 # Register your models here.
 admin.site.register(User, UserAdmin)
 admin.site.register(Order)
-admin.site.register(Item)
\ No newline at end of file
+admin.site.register(Item)
+admin.site.register(MenuItem)
+admin.site.register(RevenueSummary)
+admin.site.register(DishSales)
+admin.site.register(ArchivedOrder)
+admin.site.register(ArchivedItem)
+admin.site.register(IdempotencyKey)
\ No newline at end of file
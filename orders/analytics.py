@@ -0,0 +1,38 @@
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncHour, TruncDate
+
+from .models import Order, ArchivedOrder
+from .periods import period_lookups
+
+# Выражения, по которым группируются заказы при расчете выручки
+GROUPINGS = {
+    'hour': TruncHour('created_at'),
+    'day': TruncDate('created_at'),
+    'table': F('table_number'),
+}
+
+
+def revenue_breakdown(group_by='day', date_from=None, date_to=None):
+    """Функция возвращает выручку, количество заказов и средний чек
+    по часам, дням или столам за указанный период (даты включительно).
+    Группировка выполняется в базе данных запросом GROUP BY к рабочей
+    и к архивной таблицам заказов, после чего группы объединяются"""
+    buckets = {}
+    for model in (Order, ArchivedOrder):
+        queryset = model.objects.filter(**period_lookups('created_at', date_from, date_to))
+
+        rows = (
+            queryset.annotate(bucket=GROUPINGS[group_by])
+            .values('bucket')
+            .annotate(total_revenue=Sum('total_price'), amount_of_orders=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            bucket = buckets.setdefault(row['bucket'], {'bucket': row['bucket'], 'total_revenue': 0, 'amount_of_orders': 0})
+            bucket['total_revenue'] += row['total_revenue']
+            bucket['amount_of_orders'] += row['amount_of_orders']
+
+    results = [buckets[key] for key in sorted(buckets)]
+    for bucket in results:
+        bucket['average_bill'] = bucket['total_revenue'] / bucket['amount_of_orders']
+    return results
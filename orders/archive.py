@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Order, Item, ArchivedOrder, ArchivedItem
+from .sql import delete_rows
+
+# Столбцы, которые переносятся из рабочих таблиц в архивные
+ORDER_COLUMNS = ['id', 'table_number', 'status', 'total_price', 'created_at', 'paid_at', 'version', 'updated_at']
+ITEM_COLUMNS = ['id', 'item', 'price', 'quantity', 'menu_item_id', 'order_id']
+
+
+def archive_cutoff(days=None):
+    """Функция возвращает момент, раньше которого оплаченные заказы
+    переносятся в архив (по умолчанию - ORDERS_ARCHIVE_AFTER_DAYS дней назад)"""
+    days = settings.ORDERS_ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    """Функция возвращает заказы, оплаченные раньше cutoff"""
+    return Order.objects.filter(status=Order.PAID, paid_at__lt=cutoff)
+
+
+def _move_rows(cursor, source, target, columns, key, ids, archived_at=None):
+    """Функция копирует строки с key из ids из таблицы source
+    в таблицу target одним запросом INSERT ... SELECT"""
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    select = ', '.join(quote(column) for column in columns)
+    insert, params = select, list(ids)
+    if archived_at is not None:
+        insert += f', {quote("archived_at")}'
+        select += ', %s'
+        params = [archived_at, *ids]
+    cursor.execute(
+        f'INSERT INTO {quote(target._meta.db_table)} ({insert}) '
+        f'SELECT {select} FROM {quote(source._meta.db_table)} WHERE {quote(key)} IN ({placeholders})',
+        params,
+    )
+
+
+def archive_batch(cutoff, batch_size=None):
+    """Функция переносит в архив до batch_size самых старых по id заказов,
+    оплаченных раньше cutoff, вместе с блюдами. Перенос выполняется
+    в одной короткой транзакции: заказы блокируются (в PostgreSQL
+    заказы, заблокированные другими транзакциями, пропускаются),
+    копируются в архивные таблицы и удаляются из рабочих.
+
+    Строки удаляются SQL-запросами без сигналов моделей: архивные заказы
+    остаются в выручке и счетчиках продаж блюд, поэтому сводки не меняются.
+    Возвращает число перенесенных заказов"""
+    batch_size = batch_size or settings.ORDERS_ARCHIVE_BATCH_SIZE
+    with transaction.atomic():
+        order_ids = list(
+            archivable_orders(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+        with connection.cursor() as cursor:
+            _move_rows(cursor, Order, ArchivedOrder, ORDER_COLUMNS, 'id', order_ids, archived_at=timezone.now())
+            _move_rows(cursor, Item, ArchivedItem, ITEM_COLUMNS, 'order_id', order_ids)
+        delete_rows(Item, 'order_id', order_ids)
+        delete_rows(Order, 'id', order_ids)
+    return len(order_ids)
+
+
+def archive_orders(cutoff=None, batch_size=None, max_batches=None, pause=0, on_batch=None):
+    """Функция переносит в архив все заказы, оплаченные раньше cutoff,
+    пачками по batch_size заказов в отдельных транзакциях, чтобы
+    не держать долгих блокировок. Между пачками можно делать паузу pause
+    (в секундах), чтобы снизить нагрузку на базу и реплики.
+    После каждой пачки вызывается on_batch(число перенесенных заказов).
+    Возвращает общее число перенесенных заказов"""
+    cutoff = archive_cutoff() if cutoff is None else cutoff
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+        if on_batch is not None:
+            on_batch(archived)
+        if pause:
+            time.sleep(pause)
+    return archived
@@ -0,0 +1,76 @@
+import threading
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+
+FRAGMENT_KEY = 'orders:order:{}:{}:{}:v{}'
+# Версия формата фрагментов: увеличивается при изменении шаблонов
+# карточек или представлений API, чтобы не использовать фрагменты прежнего вида
+FRAGMENTS_FORMAT = 3
+
+# Счетчики попаданий и промахов кэша в текущем процессе
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(hits, misses):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+
+
+def get_cache_stats():
+    """Функция возвращает счетчики попаданий и промахов кэша заказов.
+    Счетчики ведутся в памяти процесса, поэтому при нескольких
+    рабочих процессах каждый из них показывает свою статистику"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else None
+    return stats
+
+
+def reset_cache_stats():
+    """Функция обнуляет счетчики попаданий и промахов кэша заказов"""
+    with _stats_lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
+
+
+def get_order_fragments(kind, orders, render, key=attrgetter('pk'), version=attrgetter('version')):
+    """Функция возвращает словарь {id заказа: фрагмент} для переданных заказов.
+
+    kind - вид фрагмента (например, HTML-карточка или представление API),
+    render - функция, которая получает список заказов, отсутствующих в кэше,
+    и возвращает для них словарь {id заказа: фрагмент},
+    key и version - функции, возвращающие id и версию заказа (по умолчанию -
+    атрибуты pk и version; для строк values() можно передать itemgetter('id')
+    и itemgetter('version')).
+    Ключ фрагмента включает версию из той же строки заказа, по которой
+    фрагмент отрисовывается, поэтому фрагмент устаревшей строки (например,
+    прочитанной до фиксации изменения или с отстающей реплики) не попадает
+    под ключ новой версии. Устаревшие фрагменты не удаляются явно,
+    а просто перестают запрашиваться.
+    Кэш опрашивается одним запросом get_many независимо от числа заказов"""
+    if not orders:
+        return {}
+
+    fragment_keys = {
+        key(order): FRAGMENT_KEY.format(key(order), version(order), kind, FRAGMENTS_FORMAT) for order in orders
+    }
+    fragments = cache.get_many(fragment_keys.values())
+    missing = [order for order in orders if fragment_keys[key(order)] not in fragments]
+    _count(hits=len(orders) - len(missing), misses=len(missing))
+
+    rendered = render(missing) if missing else {}
+    if rendered:
+        cache.set_many(
+            {fragment_keys[pk]: fragment for pk, fragment in rendered.items()},
+            timeout=settings.ORDERS_CACHE_TIMEOUT,
+        )
+
+    return {
+        pk: fragments[fragment_key] if fragment_key in fragments else rendered[pk]
+        for pk, fragment_key in fragment_keys.items()
+    }
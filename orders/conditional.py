@@ -0,0 +1,29 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Функция строит значение ETag (в кавычках) из частей, от которых
+    зависит ответ: id и версий заказов, параметров запроса и т.п."""
+    digest = hashlib.md5(':'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request, etag, last_modified=None):
+    """Функция возвращает ответ 304, если данные у клиента совпадают
+    с текущими (заголовки If-None-Match и If-Modified-Since),
+    иначе None. last_modified - объект datetime"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    """Функция добавляет в ответ заголовки ETag и Last-Modified"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DishSales, Item, ArchivedItem
+
+# Показатели, по которым составляется рейтинг блюд
+RANKINGS = {
+    'quantity': '-quantity',
+    'revenue': '-revenue',
+}
+
+# Число строк счетчиков в одном запросе INSERT
+UPSERT_BATCH_SIZE = 500
+
+
+def new_dish_sales():
+    """Функция возвращает пустой набор изменений счетчиков:
+    {(id позиции меню, день, статус): [количество, выручка]}"""
+    return defaultdict(lambda: [0, Decimal('0.00')])
+
+
+def collect_dish_sales(sales, order, items, sign=1):
+    """Функция добавляет в набор изменений счетчиков блюда заказа,
+    которые есть в памяти (например, только что созданные).
+    Блюда без позиции меню не учитываются"""
+    day = timezone.localdate(order.created_at)
+    for item in items:
+        if item.menu_item_id is None:
+            continue
+        counters = sales[item.menu_item_id, day, order.status]
+        counters[0] += sign * item.quantity
+        counters[1] += sign * Decimal(item.price) * item.quantity
+    return sales
+
+
+def order_dish_sales(order_ids=None, sign=1, status=None, sales=None):
+    """Функция добавляет в набор изменений счетчиков вклад сохраненных
+    заказов (order_ids - список id или запрос, возвращающий id,
+    None - все заказы) со знаком sign. Если задан status, вклад учитывается
+    для этого статуса вместо текущего статуса заказов.
+    Вклад вычисляется одним запросом"""
+    items = Item.objects.all()
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    return add_dish_sales(items, sign, status, sales)
+
+
+def add_dish_sales(items, sign=1, status=None, sales=None):
+    """Функция добавляет в набор изменений счетчиков вклад блюд items
+    (запрос к блюдам рабочих или архивных заказов) одним запросом"""
+    sales = new_dish_sales() if sales is None else sales
+    rows = (
+        items.filter(menu_item__isnull=False)
+        .values('menu_item_id', day=TruncDate('order__created_at'), order_status=F('order__status'))
+        .annotate(portions=Sum('quantity'), total=Sum(F('price') * F('quantity')))
+        .order_by()
+    )
+    for row in rows:
+        counters = sales[row['menu_item_id'], row['day'], status or row['order_status']]
+        counters[0] += sign * row['portions']
+        counters[1] += sign * row['total']
+    return sales
+
+
+def move_dish_sales(sales, status):
+    """Функция возвращает изменения счетчиков, которые переносят
+    вклад заказов sales из их прежних статусов в статус status"""
+    moved = new_dish_sales()
+    for (menu_item_id, day, previous_status), (quantity, revenue) in sales.items():
+        for key, sign in (((menu_item_id, day, previous_status), -1), ((menu_item_id, day, status), 1)):
+            moved[key][0] += sign * quantity
+            moved[key][1] += sign * revenue
+    return moved
+
+
+def apply_dish_sales(sales):
+    """Функция прибавляет изменения к счетчикам блюд. Строки счетчиков
+    создаются или увеличиваются запросом INSERT ... ON CONFLICT DO UPDATE
+    (PostgreSQL и SQLite), поэтому параллельные изменения не теряются.
+    Строки обновляются в порядке ключей, чтобы параллельные транзакции
+    не блокировали друг друга взаимно"""
+    rows = [
+        (menu_item_id, day, status, quantity, revenue)
+        for (menu_item_id, day, status), (quantity, revenue) in sorted(sales.items())
+        if quantity or revenue
+    ]
+    table = connection.ops.quote_name(DishSales._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} (menu_item_id, day, status, quantity, revenue) VALUES {values} '
+                f'ON CONFLICT (menu_item_id, day, status) DO UPDATE SET '
+                f'quantity = {table}.quantity + excluded.quantity, revenue = {table}.revenue + excluded.revenue',
+                [value for row in batch for value in row],
+            )
+
+
+def top_dishes(date_from=None, date_to=None, status=None, rank_by='quantity', limit=10):
+    """Функция возвращает limit самых продаваемых блюд за период
+    (даты создания заказов включительно) по количеству порций
+    или выручке, для заказов в статусе status или во всех статусах.
+    Данные читаются одним запросом к таблице счетчиков, размер которой
+    зависит от числа дней и позиций меню, а не от числа заказов"""
+    queryset = DishSales.objects.all()
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+    if status:
+        queryset = queryset.filter(status=status)
+
+    return list(
+        queryset.values('menu_item_id', name=F('menu_item__name'))
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .filter(quantity__gt=0)
+        .order_by(RANKINGS[rank_by], 'name')[:limit]
+    )
+
+
+def rebuild_dish_sales():
+    """Функция заново строит счетчики блюд по блюдам рабочих и архивных заказов.
+    Таблица счетчиков блокируется на время пересчета (в PostgreSQL),
+    поэтому заказы, сохраняемые параллельно, учитываются после его завершения.
+    Возвращает число строк счетчиков"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(DishSales._meta.db_table)} IN EXCLUSIVE MODE')
+        DishSales.objects.all().delete()
+        sales = add_dish_sales(ArchivedItem.objects.all(), sales=order_dish_sales())
+        counters = DishSales.objects.bulk_create(
+            [DishSales(menu_item_id=menu_item_id, day=day, status=status, quantity=quantity, revenue=revenue)
+             for (menu_item_id, day, status), (quantity, revenue) in sales.items()],
+            batch_size=UPSERT_BATCH_SIZE,
+        )
+    return len(counters)
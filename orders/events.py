@@ -0,0 +1,142 @@
+import asyncio
+import itertools
+import json
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Типы событий заказов
+CREATED = 'created'
+UPDATED = 'updated'
+STATUS_CHANGED = 'status_changed'
+DELETED = 'deleted'
+# Событие для подписчика, который не успевал получать события и часть их потерял:
+# клиенту нужно заново загрузить актуальное состояние
+RESYNC = 'resync'
+
+
+class Subscription:
+    """Подписка на события заказов с заданными статусами (None - на все).
+    События складываются в ограниченную очередь в цикле событий подписчика"""
+
+    def __init__(self, statuses=None, queue_size=None):
+        self.statuses = set(statuses) if statuses else None
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size or settings.ORDERS_EVENTS_QUEUE_SIZE)
+
+    def matches(self, event):
+        """Функция проверяет, относится ли событие к статусам подписки.
+        События без статуса и события смены статуса, в которых заказ
+        покидает один из статусов подписки, тоже доставляются"""
+        if self.statuses is None or event.get('status') is None:
+            return True
+        return event['status'] in self.statuses or event.get('previous_status') in self.statuses
+
+    def put(self, event):
+        """Функция добавляет событие в очередь (вызывается в цикле событий
+        подписчика). Если очередь переполнена, накопленные события
+        заменяются одним событием resync"""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': RESYNC}
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class BaseBroker:
+    """Интерфейс брокера событий заказов. Брокер задается настройкой
+    ORDERS_EVENTS_BROKER и может быть заменен, например, брокером на Redis"""
+
+    def publish(self, event):
+        """Функция рассылает событие подписчикам. Вызывается из любого потока"""
+        raise NotImplementedError
+
+    def subscribe(self, statuses=None):
+        """Функция возвращает асинхронный контекстный менеджер,
+        который выдает подписку (объект с методом async get())"""
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """Брокер событий в памяти процесса. События доставляются только
+    подписчикам того же процесса, поэтому он подходит для одного
+    рабочего процесса ASGI. Публикация из потоков синхронных представлений
+    передается в цикл событий подписчика через call_soon_threadsafe"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def publish(self, event):
+        event = {'event_id': next(self._ids), **event}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.put, event)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    self._remove(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @asynccontextmanager
+    async def subscribe(self, statuses=None):
+        subscription = Subscription(statuses)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._remove(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Функция возвращает брокер событий, заданный настройкой ORDERS_EVENTS_BROKER"""
+    return import_string(settings.ORDERS_EVENTS_BROKER)()
+
+
+def publish(event_type, order_id, status=None, **data):
+    """Функция публикует событие заказа после фиксации транзакции,
+    чтобы подписчики не получили событие об изменении, которое
+    затем было отменено, и видели сохраненные данные при повторной загрузке"""
+    event = {'type': event_type, 'id': order_id, 'status': status, **data}
+    transaction.on_commit(lambda: get_broker().publish(event), robust=True)
+
+
+def format_event(event):
+    """Функция представляет событие в формате Server-Sent Events"""
+    lines = []
+    if 'event_id' in event:
+        lines.append(f'id: {event["event_id"]}')
+    data = {key: value for key, value in event.items() if key != 'event_id'}
+    lines.append(f'event: {event["type"]}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream_events(statuses=None):
+    """Асинхронный генератор потока Server-Sent Events для подписчика.
+    Если событий нет, раз в ORDERS_EVENTS_HEARTBEAT секунд отправляется
+    комментарий, чтобы прокси не закрывали соединение"""
+    async with get_broker().subscribe(statuses) as subscription:
+        yield f'retry: {settings.ORDERS_EVENTS_RETRY_MS}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=settings.ORDERS_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_event(event)
@@ -0,0 +1,116 @@
+import csv
+import heapq
+import json
+from itertools import islice
+from operator import attrgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Order, ArchivedOrder
+
+CSV_FIELDS = ['order_id', 'table_number', 'status', 'total_price', 'created_at', 'paid_at', 'item', 'price', 'quantity']
+
+
+class Echo:
+    """Объект с интерфейсом файла, который возвращает записанную строку,
+    чтобы csv.writer формировал строки для потоковой отдачи"""
+
+    def write(self, value):
+        return value
+
+
+def get_export_queryset(status=None, id_from=None, id_to=None, model=Order):
+    """Функция возвращает заказы для выгрузки (рабочие или архивные - model),
+    отсортированные по id и отфильтрованные по статусу и диапазону id (включительно)"""
+    queryset = model.objects.order_by('id')
+    if status:
+        queryset = queryset.filter(status=status)
+    if id_from is not None:
+        queryset = queryset.filter(id__gte=id_from)
+    if id_to is not None:
+        queryset = queryset.filter(id__lte=id_to)
+    return queryset.prefetch_related('items')
+
+
+def iter_orders(queryset, chunk_size=None):
+    """Функция перебирает заказы пачками по chunk_size через серверный курсор.
+    Блюда подгружаются одним запросом на каждую пачку,
+    поэтому потребление памяти не зависит от числа заказов"""
+    return queryset.iterator(chunk_size=chunk_size or settings.ORDERS_EXPORT_CHUNK_SIZE)
+
+
+def order_to_dict(order):
+    """Функция возвращает заказ с блюдами в виде словаря для JSON Lines"""
+    return {
+        'id': order.id,
+        'table_number': order.table_number,
+        'status': order.status,
+        'total_price': str(order.total_price),
+        'created_at': order.created_at.isoformat(),
+        'paid_at': order.paid_at.isoformat() if order.paid_at else None,
+        'items': [
+            {'item': item.item, 'price': str(item.price), 'quantity': item.quantity} for item in order.items.all()
+        ],
+    }
+
+
+def iter_jsonl(orders):
+    """Функция построчно формирует выгрузку в формате JSON Lines:
+    одна строка на заказ вместе с его блюдами"""
+    for order in orders:
+        yield json.dumps(order_to_dict(order), ensure_ascii=False) + '\n'
+
+
+def iter_csv(orders):
+    """Функция построчно формирует выгрузку в формате CSV: одна строка
+    на блюдо с повторением полей заказа. Заказ без блюд выгружается
+    одной строкой с пустыми полями блюда"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for order in orders:
+        order_fields = [
+            order.id,
+            order.table_number,
+            order.status,
+            order.total_price,
+            order.created_at.isoformat(),
+            order.paid_at.isoformat() if order.paid_at else '',
+        ]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(order_fields + ['', '', ''])
+        for item in items:
+            yield writer.writerow(order_fields + [item.item, item.price, item.quantity])
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (iter_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def export_orders(export_format='csv', status=None, id_from=None, id_to=None, chunk_size=None, archived=True):
+    """Функция возвращает генератор строк выгрузки заказов в указанном формате.
+    С archived=True в выгрузку попадают и архивные заказы: рабочие и архивные
+    заказы читаются параллельно и объединяются в общем порядке id"""
+    serialize, _ = FORMATS[export_format]
+    models = [Order]
+    if archived and status in (None, '', Order.PAID):
+        models.append(ArchivedOrder)
+    streams = [iter_orders(get_export_queryset(status, id_from, id_to, model), chunk_size) for model in models]
+    return serialize(heapq.merge(*streams, key=attrgetter('id')))
+
+
+async def aiter_export(rows, chunk_size=None):
+    """Функция отдает строки выгрузки rows асинхронно для потоковых ответов
+    под ASGI. Строки читаются из синхронного генератора пачками
+    по chunk_size в потоке соединения с базой (sync_to_async), поэтому
+    в памяти одновременно находится только одна пачка строк"""
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size or settings.ORDERS_EXPORT_CHUNK_SIZE)))
+    try:
+        while chunk := await next_chunk():
+            yield ''.join(chunk)
+    finally:
+        # Курсор выгрузки закрывается в том же потоке, где он был открыт
+        await sync_to_async(rows.close)()
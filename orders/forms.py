@@ -1,7 +1,6 @@
-from random import choices
-
 from django import forms
-from .models import Order, Item
+from .models import Order, Item, MenuItem
+from .periods import validate_period
 
 
 class OrderForm(forms.ModelForm):
@@ -13,22 +12,139 @@ class OrderForm(forms.ModelForm):
 class OrderEditForm(forms.ModelForm):
     class Meta:
         model = Order
-        fields = ['status']
+        # Версия, с которой начато редактирование, проверяется при сохранении
+        fields = ['status', 'version']
+        widgets = {'version': forms.HiddenInput}
+
+    def clean_status(self):
+        """Функция проверяет, что переход из текущего статуса заказа допустим.
+        Текущий статус прочитан вместе с версией заказа, которую save_order
+        проверяет при сохранении, поэтому проверка не устаревает"""
+        status = self.cleaned_data['status']
+        error = Order.status_change_error(self.instance.status, status)
+        if error:
+            raise forms.ValidationError(error)
+        return status
 
 
 class ItemForm(forms.ModelForm):
     class Meta:
         model = Item
-        fields = ['item', 'price']
+        fields = ['item', 'price', 'quantity']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Без цены блюдо получает текущую цену из меню (в save_order),
+        # поэтому новое блюдо не подставляет цену по умолчанию из модели
+        self.fields['price'].required = False
+        self.fields['price'].initial = None
+        self.fields['quantity'].widget.attrs['min'] = 1
+
+    def save(self, commit=True):
+        # Переименованное блюдо заново связывается с позицией меню в save_order
+        if 'item' in self.changed_data:
+            self.instance.menu_item = None
+        return super().save(commit)
+
+
+class BaseItemFormSet(forms.BaseModelFormSet):
+
+    def clean(self):
+        """Функция проверяет, что блюда без цены есть в меню:
+        их цена берется из меню. Меню проверяется одним запросом
+        для всех форм блюд, а связывание с позициями меню выполняет save_order"""
+        super().clean()
+        names = {
+            form.cleaned_data['item'] for form in self.forms
+            if form.has_changed() and form.cleaned_data.get('item') and form.cleaned_data.get('price') is None
+        }
+        unknown = names - set(MenuItem.objects.filter(name__in=names).values_list('name', flat=True))
+        if unknown:
+            raise forms.ValidationError(f'Нет в меню, укажите цену: {", ".join(sorted(unknown))}')
 
 
 class OrderSearchForm(forms.Form):
-    STATUS_CHOICES = [
-        ('','пусто'),
-        ('в ожидании', 'В ожидании'),
-        ('готов', 'Готов'),
-        ('оплачен', 'Оплачен'),
-    ]
+    STATUS_CHOICES = [('', 'пусто')] + Order.STATUS_CHOICES
 
+    q = forms.CharField(required=False, max_length=100, label='Блюдо')
     id = forms.IntegerField(required=False, label='ID заказа')
-    status = forms.ChoiceField(required=False, choices=STATUS_CHOICES, label='Статус')
\ No newline at end of file
+    status = forms.ChoiceField(required=False, choices=STATUS_CHOICES, label='Статус')
+    table_number = forms.IntegerField(required=False, label='Номер стола')
+    price_from = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Стоимость от')
+    price_to = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Стоимость до')
+    date_from = forms.DateField(required=False, label='С', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='По', widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        """Функция проверяет, что границы диапазонов стоимости и дат не перепутаны"""
+        cleaned_data = super().clean()
+        price_from = cleaned_data.get('price_from')
+        price_to = cleaned_data.get('price_to')
+        if price_from is not None and price_to is not None and price_from > price_to:
+            raise forms.ValidationError('Нижняя граница стоимости не может быть больше верхней')
+        validate_period(cleaned_data.get('date_from'), cleaned_data.get('date_to'))
+        return cleaned_data
+
+
+class RevenueAnalyticsForm(forms.Form):
+    GROUP_BY_CHOICES = [
+        ('hour', 'По часам'),
+        ('day', 'По дням'),
+        ('table', 'По столам'),
+    ]
+
+    date_from = forms.DateField(required=False, label='С', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='По', widget=forms.DateInput(attrs={'type': 'date'}))
+    group_by = forms.ChoiceField(required=False, choices=GROUP_BY_CHOICES, initial='day', label='Группировка')
+
+    def clean(self):
+        """Функция проверяет, что начало периода не позже его окончания"""
+        cleaned_data = super().clean()
+        validate_period(cleaned_data.get('date_from'), cleaned_data.get('date_to'))
+        cleaned_data['group_by'] = cleaned_data.get('group_by') or 'day'
+        return cleaned_data
+
+
+class DishAnalyticsForm(forms.Form):
+    RANK_BY_CHOICES = [
+        ('quantity', 'По количеству порций'),
+        ('revenue', 'По выручке'),
+    ]
+    STATUS_CHOICES = [('', 'все')] + Order.STATUS_CHOICES
+
+    date_from = forms.DateField(required=False, label='С', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='По', widget=forms.DateInput(attrs={'type': 'date'}))
+    status = forms.ChoiceField(required=False, choices=STATUS_CHOICES, label='Статус')
+    rank_by = forms.ChoiceField(required=False, choices=RANK_BY_CHOICES, initial='quantity', label='Рейтинг')
+    limit = forms.IntegerField(required=False, min_value=1, max_value=100, initial=10, label='Количество блюд')
+
+    def clean(self):
+        """Функция проверяет, что начало периода не позже его окончания,
+        и подставляет значения по умолчанию"""
+        cleaned_data = super().clean()
+        validate_period(cleaned_data.get('date_from'), cleaned_data.get('date_to'))
+        cleaned_data['rank_by'] = cleaned_data.get('rank_by') or 'quantity'
+        cleaned_data['limit'] = cleaned_data.get('limit') or 10
+        return cleaned_data
+
+
+class OrderExportForm(forms.Form):
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+
+    format = forms.ChoiceField(required=False, choices=FORMAT_CHOICES, label='Формат')
+    status = forms.ChoiceField(required=False, choices=OrderSearchForm.STATUS_CHOICES, label='Статус')
+    id_from = forms.IntegerField(required=False, min_value=1, label='ID заказа с')
+    id_to = forms.IntegerField(required=False, min_value=1, label='ID заказа по')
+
+    def clean(self):
+        """Функция проверяет диапазон id и подставляет формат по умолчанию"""
+        cleaned_data = super().clean()
+        id_from = cleaned_data.get('id_from')
+        id_to = cleaned_data.get('id_to')
+        if id_from and id_to and id_from > id_to:
+            raise forms.ValidationError('Начало диапазона id не может быть больше его конца')
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        return cleaned_data
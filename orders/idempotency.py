@@ -0,0 +1,127 @@
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+# Заголовок запроса с ключом идемпотентности
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Скрытое поле форм создания с ключом идемпотентности
+IDEMPOTENCY_FIELD = 'idempotency_key'
+# Заголовок, которым отмечается повторно отданный сохраненный ответ
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# Заголовки ответа, которые сохраняются вместе с ним
+STORED_HEADERS = ['Location']
+
+
+def new_idempotency_key():
+    """Функция возвращает новый ключ для скрытого поля формы. Ключ
+    создается при каждой отрисовке формы, поэтому повторная отправка
+    той же формы повторяет запрос, а исправленная форма - новый запрос"""
+    return uuid.uuid4().hex
+
+
+def request_fingerprint(request):
+    """Функция возвращает хэш метода, пути и тела запроса"""
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.get_full_path().encode(), request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def replay(record):
+    """Функция строит ответ из сохраненного ответа на первый запрос"""
+    response = HttpResponse(bytes(record.content), status=record.status_code, content_type=record.content_type)
+    for name, value in record.headers.items():
+        response[name] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def claim_key(key, fingerprint):
+    """Функция занимает ключ в текущей транзакции. Параллельный запрос
+    с тем же ключом ждет на уникальном индексе, пока транзакция первого
+    не завершится, поэтому повторы упорядочиваются по ключу без блокировки
+    таблиц. Возвращает None, если ключ занят этим запросом, иначе ответ
+    для повторного запроса"""
+    IdempotencyKey.objects.filter(key=key, expires_at__lte=timezone.now()).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=timezone.now() + timedelta(seconds=settings.ORDERS_IDEMPOTENCY_TTL),
+            )
+        return None
+    except IntegrityError:
+        record = IdempotencyKey.objects.filter(key=key).first()
+
+    if record is None or record.status_code is None:
+        return JsonResponse({'detail': 'Запрос с этим ключом идемпотентности еще выполняется'}, status=409)
+    if record.fingerprint != fingerprint:
+        return JsonResponse({'detail': 'Ключ идемпотентности уже использован для другого запроса'}, status=422)
+    return replay(record)
+
+
+def store_response(key, response):
+    """Функция сохраняет ответ на первый запрос с ключом"""
+    IdempotencyKey.objects.filter(key=key).update(
+        status_code=response.status_code,
+        content=response.content,
+        content_type=response.get('Content-Type', ''),
+        headers={name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+    )
+
+
+def idempotent(form_field=None):
+    """Декоратор представления, которое создает данные запросом POST.
+    Ключ идемпотентности берется из заголовка Idempotency-Key
+    (или из поля формы form_field). Первый запрос с ключом выполняется
+    в одной транзакции с сохранением ответа, повторный - получает
+    сохраненный ответ, не выполняя представление. Ответы с кодом 5xx
+    не сохраняются, а изменения такого запроса откатываются.
+    Запросы без ключа выполняются как обычно"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+            # Тело запроса читается до request.POST, после разбора формы оно недоступно
+            fingerprint = request_fingerprint(request)
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key and form_field:
+                key = request.POST.get(form_field)
+            if not key:
+                return view(request, *args, **kwargs)
+
+            key = key[:IdempotencyKey._meta.get_field('key').max_length]
+            with transaction.atomic():
+                response = claim_key(key, fingerprint)
+                if response is not None:
+                    return response
+
+                response = view(request, *args, **kwargs)
+                # Ответы шаблонов и DRF отрисовываются, чтобы сохранить их содержимое
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+                if response.status_code >= 500 or transaction.get_rollback():
+                    transaction.set_rollback(True)
+                else:
+                    store_response(key, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_idempotency_keys():
+    """Функция удаляет ключи идемпотентности с истекшим сроком хранения
+    и возвращает их число"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,263 @@
+import csv
+import io
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from itertools import groupby, islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Order, Item
+from .dishes import new_dish_sales, collect_dish_sales, apply_dish_sales
+from .revenue import apply_revenue_delta
+from .services import attach_menu_items
+
+
+class RecordError(ValueError):
+    """Ошибка проверки одной записи импортируемого файла"""
+
+
+def read_jsonl(file):
+    """Функция построчно читает заказы в формате JSON Lines,
+    совпадающем с форматом выгрузки export_orders.
+    Строки разбираются при проверке, чтобы ошибка в одной
+    строке не прерывала импорт"""
+    for line in file:
+        if line.strip():
+            yield line
+
+
+def read_csv(file):
+    """Функция читает заказы в формате CSV выгрузки export_orders:
+    подряд идущие строки с одинаковым order_id образуют один заказ"""
+    rows = csv.DictReader(file)
+    for _, order_rows in groupby(rows, key=lambda row: row.get('order_id')):
+        order_rows = list(order_rows)
+        record = dict(order_rows[0])
+        record['items'] = [
+            # Выгрузки без столбца quantity содержат по одной порции блюда
+            {'item': row['item'], 'price': row['price'], 'quantity': row.get('quantity') or 1}
+            for row in order_rows if row.get('item')
+        ]
+        yield record
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def parse_timestamp(value, field):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise RecordError(f'некорректное значение {field}: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def check_field(model, name, value, message):
+    """Функция проверяет значение по ограничениям поля модели (число цифр
+    и знаков после запятой, диапазон целых чисел в базе), чтобы запись,
+    которую база не примет, отклонялась отдельно, а не прерывала всю пачку"""
+    try:
+        model._meta.get_field(name).run_validators(value)
+    except ValidationError:
+        raise RecordError(message)
+    return value
+
+
+def parse_price(value, field):
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise RecordError(f'некорректное значение {field}: {value}')
+    if not price.is_finite() or price < 0:
+        raise RecordError(f'некорректное значение {field}: {value}')
+    return check_field(Item, 'price', price, f'некорректное значение {field}: {value}')
+
+
+def parse_quantity(value):
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'некорректное количество: {value}')
+    if quantity < 1:
+        raise RecordError(f'некорректное количество: {value}')
+    return check_field(Item, 'quantity', quantity, f'некорректное количество: {value}')
+
+
+def validate_record(record):
+    """Функция проверяет запись и возвращает заказ и список его блюд
+    (еще не сохраненные). При ошибке выбрасывается RecordError"""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError:
+            raise RecordError('строка не является корректным JSON')
+    if not isinstance(record, dict):
+        raise RecordError('запись должна быть объектом')
+
+    try:
+        table_number = int(record['table_number'])
+    except (KeyError, TypeError, ValueError):
+        raise RecordError(f'некорректный номер стола: {record.get("table_number")}')
+    check_field(Order, 'table_number', table_number, f'некорректный номер стола: {table_number}')
+
+    status = Order.normalize_status(record.get('status') or Order.PENDING)
+    if status is None:
+        raise RecordError(f'неизвестный статус: {record.get("status")}')
+
+    created_at = parse_timestamp(record.get('created_at'), 'created_at') or timezone.now()
+    paid_at = parse_timestamp(record.get('paid_at'), 'paid_at')
+    if status == Order.PAID and paid_at is None:
+        paid_at = created_at
+
+    items = []
+    for item_data in record.get('items') or []:
+        if not isinstance(item_data, dict):
+            raise RecordError('блюдо должно быть объектом')
+        name = (item_data.get('item') or '').strip()
+        if not name or len(name) > Item._meta.get_field('item').max_length:
+            raise RecordError(f'некорректное название блюда: {name}')
+        items.append(Item(
+            item=name,
+            price=parse_price(item_data.get('price', 0), 'price'),
+            quantity=parse_quantity(item_data.get('quantity', 1)),
+        ))
+
+    # Общая стоимость вычисляется в базе при вставке и тоже должна уместиться в поле заказа
+    total_price = sum((item.price * item.quantity for item in items), Decimal('0.00'))
+    check_field(Order, 'total_price', total_price, f'слишком большая общая стоимость заказа: {total_price}')
+
+    order = Order(table_number=table_number, status=status, created_at=created_at, paid_at=paid_at)
+    return order, items
+
+
+def copy_items(items):
+    """Функция загружает блюда командой COPY (только PostgreSQL).
+    Поддерживаются драйверы psycopg2 и psycopg 3"""
+    columns = ', '.join(
+        Item._meta.get_field(name).column for name in ('order', 'item', 'price', 'quantity', 'menu_item')
+    )
+    sql = f'COPY {Item._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for item in items:
+        writer.writerow([item.order_id, item.item, item.price, item.quantity, item.menu_item_id])
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def insert_batch(batch, use_copy):
+    """Функция сохраняет пачку заказов с блюдами в одной транзакции:
+    заказы - одним bulk_create, блюда - командой COPY или bulk_create
+    (предварительно они связываются с позициями меню), счетчики продаж
+    блюд - одним запросом. Общая стоимость заказов вычисляется
+    одним запросом UPDATE в базе.
+    Возвращает выручку, добавленную пачкой"""
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([order for order, _ in batch])
+
+        items = []
+        for order, order_items in zip(orders, (order_items for _, order_items in batch)):
+            for item in order_items:
+                item.order = order
+                items.append(item)
+        if items:
+            attach_menu_items(items)
+            sales = new_dish_sales()
+            for order, order_items in zip(orders, (order_items for _, order_items in batch)):
+                collect_dish_sales(sales, order, order_items)
+            apply_dish_sales(sales)
+            if use_copy:
+                copy_items(items)
+            else:
+                Item.objects.bulk_create(items)
+
+        order_ids = [order.pk for order in orders]
+        items_total = (
+            Item.objects.filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum(F('price') * F('quantity')))
+            .values('total')
+        )
+        Order.objects.filter(pk__in=order_ids).update(
+            total_price=Coalesce(Subquery(items_total), Value(Decimal('0.00')), output_field=DecimalField()),
+        )
+
+        revenue = Order.objects.filter(pk__in=order_ids).aggregate(total=Sum('total_price', default=0))['total']
+        apply_revenue_delta(revenue, orders=len(order_ids))
+    return revenue
+
+
+def load_checkpoint(path):
+    """Функция возвращает число уже обработанных записей из файла контрольной точки"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['records']
+
+
+def save_checkpoint(path, records):
+    """Функция атомарно записывает число обработанных записей в файл контрольной точки"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'records': records}, file)
+    os.replace(tmp_path, path)
+
+
+def import_orders(records, batch_size=1000, skip=0, use_copy=None, checkpoint=None, on_batch=None):
+    """Функция импортирует поток записей пачками по batch_size.
+
+    skip - число записей, уже импортированных ранее (при возобновлении),
+    use_copy - загружать ли блюда командой COPY (по умолчанию - если база PostgreSQL),
+    checkpoint - путь к файлу контрольной точки, который обновляется после каждой пачки,
+    on_batch - функция, вызываемая после пачки со сводкой импорта.
+    Некорректные записи пропускаются и возвращаются в списке errors
+    вместе с их порядковыми номерами"""
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+
+    summary = {'records': skip, 'orders': 0, 'revenue': Decimal('0.00'), 'errors': []}
+    records = islice(enumerate(records, start=1), skip, None)
+
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+
+        batch = []
+        for number, record in chunk:
+            try:
+                batch.append(validate_record(record))
+            except RecordError as error:
+                summary['errors'].append((number, str(error)))
+
+        if batch:
+            summary['revenue'] += insert_batch(batch, use_copy)
+        summary['orders'] += len(batch)
+        summary['records'] = chunk[-1][0]
+
+        if checkpoint:
+            save_checkpoint(checkpoint, summary['records'])
+        if on_batch:
+            on_batch(summary)
+
+    return summary
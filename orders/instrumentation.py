@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Накопленная статистика по представлениям в текущем процессе
+_report = {}
+_report_lock = threading.Lock()
+
+
+class QueryRecorder:
+    """Обертка для connection.execute_wrapper, которая считает
+    запросы к базе, их суммарное время и самый медленный запрос"""
+
+    def __init__(self, view_name=None):
+        self.view_name = view_name
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.db_time += duration
+            if duration > self.slowest_time:
+                self.slowest_time = duration
+                self.slowest_sql = sql
+            if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                logger.warning('Медленный запрос в %s (%.1f мс): %s', self.view_name, duration * 1000, sql)
+
+
+def install_recorder(recorder, stack):
+    """Функция добавляет счетчик recorder к подключениям всех баз текущего
+    потока через connection.execute_wrapper. Обертки снимаются при закрытии
+    stack в том же порядке, в каком их ожидает стек execute_wrappers.
+    Подключения создаются на каждый поток, поэтому асинхронный запрос
+    вызывает функцию в потоке, где выполняются его запросы к базе"""
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+def record_request(view_name, recorder, total_time):
+    """Функция добавляет сведения об обработанном запросе в отчет"""
+    with _report_lock:
+        stats = _report.setdefault(view_name, {
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_time': 0.0,
+            'total_time': 0.0,
+            'slowest_query_time': 0.0,
+            'slowest_query': None,
+        })
+        stats['requests'] += 1
+        stats['queries'] += recorder.count
+        stats['max_queries'] = max(stats['max_queries'], recorder.count)
+        stats['db_time'] += recorder.db_time
+        stats['total_time'] += total_time
+        if recorder.slowest_time > stats['slowest_query_time']:
+            stats['slowest_query_time'] = recorder.slowest_time
+            stats['slowest_query'] = recorder.slowest_sql
+
+
+def get_report():
+    """Функция возвращает отчет по представлениям: число запросов к ним,
+    среднее и максимальное число SQL-запросов, среднее время работы
+    с базой и вне ее (обработка и отрисовка ответа), а также
+    самый медленный SQL-запрос. Время указано в миллисекундах"""
+    with _report_lock:
+        report = {view_name: dict(stats) for view_name, stats in _report.items()}
+
+    result = {}
+    for view_name, stats in sorted(report.items()):
+        requests = stats['requests']
+        result[view_name] = {
+            'requests': requests,
+            'avg_queries': round(stats['queries'] / requests, 2),
+            'max_queries': stats['max_queries'],
+            'avg_db_time': round(stats['db_time'] / requests * 1000, 2),
+            'avg_render_time': round((stats['total_time'] - stats['db_time']) / requests * 1000, 2),
+            'avg_total_time': round(stats['total_time'] / requests * 1000, 2),
+            'slowest_query_time': round(stats['slowest_query_time'] * 1000, 2),
+            'slowest_query': stats['slowest_query'],
+        }
+    return result
+
+
+def reset_report():
+    """Функция очищает накопленный отчет"""
+    with _report_lock:
+        _report.clear()
+
+
+class QueryInstrumentationMiddleware:
+    """Middleware, которое для каждого запроса считает число SQL-запросов,
+    время работы с базой, самый медленный запрос и время вне базы
+    (обработка и отрисовка ответа). Сведения накапливаются в отчете
+    по имени маршрута, а в режиме DEBUG также возвращаются в заголовках ответа"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = request._query_recorder = QueryRecorder()
+        start = time.perf_counter()
+        with install_recorder(recorder, ExitStack()):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = request._query_recorder = QueryRecorder()
+        start = time.perf_counter()
+        # Запросы асинхронных представлений и асинхронного ORM выполняются
+        # в общем потоке запроса (sync_to_async), где и ставятся обертки
+        stack = await sync_to_async(install_recorder)(recorder, ExitStack())
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Функция запоминает имя маршрута, чтобы указывать его
+        в журнале медленных запросов"""
+        request._query_recorder.view_name = request.resolver_match.view_name
+
+    def finish(self, request, response, recorder, total_time):
+        """Функция записывает сведения о запросе в отчет
+        и в режиме DEBUG добавляет их в заголовки ответа"""
+        view_name = recorder.view_name or '<unresolved>'
+        record_request(view_name, recorder, total_time)
+
+        if settings.DEBUG:
+            response['X-View-Name'] = view_name
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-ms'] = f'{recorder.db_time * 1000:.2f}'
+            response['X-Render-Time-ms'] = f'{(total_time - recorder.db_time) * 1000:.2f}'
+            if recorder.slowest_sql is not None:
+                response['X-DB-Slowest-Query-ms'] = f'{recorder.slowest_time * 1000:.2f}'
+        return response
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит оплаченные заказы старше заданного срока в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='возраст оплаты в днях (по умолчанию ORDERS_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, help='число заказов в одной транзакции')
+        parser.add_argument('--max-batches', type=int, help='максимальное число пачек за один запуск')
+        parser.add_argument('--pause', type=float, default=0, help='пауза между пачками в секундах')
+        parser.add_argument('--loop', action='store_true', help='повторять перенос, пока команду не остановят')
+        parser.add_argument('--interval', type=float, default=3600, help='пауза между повторами в секундах (с --loop)')
+
+    def handle(self, *args, **options):
+        while True:
+            cutoff = archive_cutoff(options['days'])
+            archived = archive_orders(
+                cutoff,
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+                pause=options['pause'],
+                on_batch=lambda archived: self.stdout.write(f'Перенесено заказов: {archived}'),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Перенесено в архив заказов, оплаченных до {cutoff:%Y-%m-%d %H:%M}: {archived}'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
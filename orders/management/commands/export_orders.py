@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.export import export_orders, FORMATS
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает заказы с блюдами в CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FORMATS), default='csv', help='формат выгрузки')
+        parser.add_argument('--status', help='статус выгружаемых заказов')
+        parser.add_argument('--id-from', type=int, help='минимальный id заказа (включительно)')
+        parser.add_argument('--id-to', type=int, help='максимальный id заказа (включительно)')
+        parser.add_argument('--chunk-size', type=int, help='число заказов, читаемых из базы за один раз')
+        parser.add_argument('--no-archive', action='store_true', help='не выгружать архивные заказы')
+        parser.add_argument('--output', help='файл для выгрузки (по умолчанию - стандартный вывод)')
+
+    def handle(self, *args, **options):
+        status = options['status']
+        if status:
+            status = Order.normalize_status(status)
+            if status is None:
+                raise CommandError(f'Неизвестный статус: {options["status"]}')
+
+        rows = export_orders(
+            options['format'],
+            status=status,
+            id_from=options['id_from'],
+            id_to=options['id_to'],
+            chunk_size=options['chunk_size'],
+            archived=not options['no_archive'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(rows)
+        else:
+            for row in rows:
+                self.stdout.write(row, ending='')
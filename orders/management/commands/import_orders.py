@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.importer import import_orders, load_checkpoint, READERS
+
+
+class Command(BaseCommand):
+    help = 'Импортирует заказы с блюдами из CSV или JSON Lines (формат выгрузки export_orders)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл с заказами')
+        parser.add_argument('--format', choices=list(READERS), help='формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='число заказов в одной транзакции')
+        parser.add_argument('--checkpoint', help='файл контрольной точки (по умолчанию <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true', help='продолжить импорт с контрольной точки')
+        parser.add_argument('--no-copy', action='store_true', help='не использовать COPY даже для PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in READERS:
+            raise CommandError(f'Не удалось определить формат файла {path}, укажите --format')
+
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = load_checkpoint(checkpoint) if options['resume'] else 0
+        if skip:
+            self.stdout.write(f'Продолжение импорта после записи {skip}')
+
+        started = time.perf_counter()
+
+        def report(summary):
+            elapsed = time.perf_counter() - started
+            rate = summary['orders'] / elapsed if elapsed else 0
+            self.stdout.write(
+                f'Обработано записей: {summary["records"]}, импортировано заказов: {summary["orders"]}, '
+                f'ошибок: {len(summary["errors"])}, {rate:.0f} заказов/с'
+            )
+
+        with open(path, encoding='utf-8', newline='') as file:
+            summary = import_orders(
+                READERS[import_format](file),
+                batch_size=options['batch_size'],
+                skip=skip,
+                use_copy=False if options['no_copy'] else None,
+                checkpoint=checkpoint,
+                on_batch=report,
+            )
+
+        for number, error in summary['errors']:
+            self.stderr.write(f'Запись {number}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано заказов: {summary["orders"]} на сумму {summary["revenue"]} руб. '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи идемпотентности с истекшим сроком хранения'
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей идемпотентности: {deleted}'))
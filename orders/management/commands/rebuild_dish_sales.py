@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.dishes import rebuild_dish_sales
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики продаж блюд по всем заказам'
+
+    def handle(self, *args, **options):
+        counters = rebuild_dish_sales()
+        self.stdout.write(self.style.SUCCESS(f'Строк счетчиков продаж блюд: {counters}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.revenue import rebuild_revenue_summary
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводку выручки по всем заказам'
+
+    def handle(self, *args, **options):
+        summary = rebuild_revenue_summary()
+        self.stdout.write(self.style.SUCCESS(str(summary)))
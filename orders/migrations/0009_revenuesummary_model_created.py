@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:24
+
+from django.db import migrations, models
+from django.db.models import Sum, Count
+
+
+def build_revenue_summary(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    RevenueSummary = apps.get_model('orders', 'RevenueSummary')
+    totals = Order.objects.aggregate(total_revenue=Sum('total_price', default=0), amount_of_orders=Count('id'))
+    RevenueSummary.objects.create(pk=1, **totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_item_model_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('amount_of_orders', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_revenue_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:24
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_paid_orders(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(status='оплачен', paid_at__isnull=True).update(paid_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_revenuesummary_model_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(mark_paid_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# Прежние значения статуса (в любом регистре) и соответствующие им коды
+STATUS_CODES = {
+    'в ожидании': 'pending',
+    'готов': 'ready',
+    'оплачен': 'paid',
+}
+
+
+def normalize_statuses(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    for status in Order.objects.values_list('status', flat=True).distinct():
+        code = STATUS_CODES.get(status.strip().lower(), 'pending')
+        if code != status:
+            Order.objects.filter(status=status).update(status=code)
+
+
+def restore_statuses(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    for status, code in STATUS_CODES.items():
+        Order.objects.filter(status=code).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_timestamps_added'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_statuses, restore_statuses),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:36
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_updated_at(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.update(updated_at=Coalesce('paid_at', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_order_status_indexes_added'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# Индексы PostgreSQL для поиска по названиям блюд: полнотекстовый
+# (выражение совпадает с SearchVector('item', config='russian'))
+# и триграммный для нечеткого поиска (оператор %)
+POSTGRESQL_INDEXES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX IF NOT EXISTS item_item_search_idx ON orders_item "
+    "USING gin (to_tsvector('russian'::regconfig, COALESCE(item, '')))",
+    'CREATE INDEX IF NOT EXISTS item_item_trgm_idx ON orders_item USING gin (item gin_trgm_ops)',
+]
+
+POSTGRESQL_DROP_INDEXES_SQL = [
+    'DROP INDEX IF EXISTS item_item_search_idx',
+    'DROP INDEX IF EXISTS item_item_trgm_idx',
+]
+
+# Полнотекстовый индекс SQLite (FTS5) по названиям блюд. Индекс хранит
+# только токены, сами названия читаются из orders_item, а синхронизация
+# выполняется триггерами
+SQLITE_FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS orders_item_fts USING fts5(item, content='orders_item', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_insert AFTER INSERT ON orders_item BEGIN '
+    'INSERT INTO orders_item_fts(rowid, item) VALUES (new.id, new.item); END',
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_delete AFTER DELETE ON orders_item BEGIN '
+    "INSERT INTO orders_item_fts(orders_item_fts, rowid, item) VALUES ('delete', old.id, old.item); END",
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_update AFTER UPDATE OF item ON orders_item BEGIN '
+    "INSERT INTO orders_item_fts(orders_item_fts, rowid, item) VALUES ('delete', old.id, old.item); "
+    'INSERT INTO orders_item_fts(rowid, item) VALUES (new.id, new.item); END',
+    "INSERT INTO orders_item_fts(orders_item_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_FTS_SQL = [
+    'DROP TRIGGER IF EXISTS orders_item_fts_insert',
+    'DROP TRIGGER IF EXISTS orders_item_fts_delete',
+    'DROP TRIGGER IF EXISTS orders_item_fts_update',
+    'DROP TABLE IF EXISTS orders_item_fts',
+]
+
+
+def run_for_vendor(statements):
+    """Функция возвращает операцию RunPython, которая выполняет
+    SQL-запросы statements ({СУБД: список запросов}) для текущей СУБД"""
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_order_version_added'),
+    ]
+
+    operations = [
+        # Индексы зависят от СУБД: GIN-индексы (полнотекстовый и триграммный)
+        # в PostgreSQL, таблица FTS5 с триггерами в SQLite
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRESQL_INDEXES_SQL, 'sqlite': SQLITE_FTS_SQL}),
+            run_for_vendor({'postgresql': POSTGRESQL_DROP_INDEXES_SQL, 'sqlite': SQLITE_DROP_FTS_SQL}),
+        ),
+    ]
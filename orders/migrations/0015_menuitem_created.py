@@ -0,0 +1,92 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+
+# Полнотекстовый индекс SQLite (FTS5) по названиям блюд из миграции 0014.
+# PostgreSQL сохраняет индексы при изменении таблицы, а SQLite пересоздает
+# таблицу orders_item вместе с триггерами, поэтому они создаются заново
+SQLITE_FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS orders_item_fts USING fts5(item, content='orders_item', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_insert AFTER INSERT ON orders_item BEGIN '
+    'INSERT INTO orders_item_fts(rowid, item) VALUES (new.id, new.item); END',
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_delete AFTER DELETE ON orders_item BEGIN '
+    "INSERT INTO orders_item_fts(orders_item_fts, rowid, item) VALUES ('delete', old.id, old.item); END",
+    'CREATE TRIGGER IF NOT EXISTS orders_item_fts_update AFTER UPDATE OF item ON orders_item BEGIN '
+    "INSERT INTO orders_item_fts(orders_item_fts, rowid, item) VALUES ('delete', old.id, old.item); "
+    'INSERT INTO orders_item_fts(rowid, item) VALUES (new.id, new.item); END',
+    "INSERT INTO orders_item_fts(orders_item_fts) VALUES ('rebuild')",
+]
+
+
+def create_sqlite_search_index(apps, schema_editor):
+    """Индекс FTS5 и его триггеры создаются заново после пересоздания таблицы"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Одинаковые блюда одного заказа (название и цена) объединяются
+    в одну строку с количеством порций"""
+    Item = apps.get_model('orders', 'Item')
+    groups = Item.objects.values('order_id', 'item', 'price').annotate(keep=Min('id'), count=Count('id'))
+    group_size = (
+        Item.objects.filter(order_id=OuterRef('order_id'), item=OuterRef('item'), price=OuterRef('price'))
+        .values('order_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Item.objects.filter(id__in=groups.filter(count__gt=1).values('keep')).update(quantity=Subquery(group_size))
+    Item.objects.exclude(id__in=groups.values('keep')).delete()
+
+
+def fill_menu_items(apps, schema_editor):
+    """Позиции меню создаются из различных названий блюд
+    с ценой из последнего заказа этого блюда"""
+    Item = apps.get_model('orders', 'Item')
+    MenuItem = apps.get_model('orders', 'MenuItem')
+    last_ids = Item.objects.values('item').annotate(last_id=Max('id')).values_list('last_id', flat=True)
+    MenuItem.objects.bulk_create(
+        (MenuItem(name=name, price=price) for name, price in
+         Item.objects.filter(id__in=list(last_ids)).values_list('item', 'price').iterator()),
+        batch_size=1000,
+    )
+    Item.objects.update(menu_item=Subquery(MenuItem.objects.filter(name=OuterRef('item')).values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_item_search_indexes_added'),
+    ]
+
+    operations = [
+        # SQLite пересоздает таблицу orders_item при изменении полей,
+        # и вместе с ней удаляются триггеры индекса поиска: они создаются заново
+        migrations.RunPython(migrations.RunPython.noop, create_sqlite_search_index),
+        migrations.CreateModel(
+            name='MenuItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=7)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='menu_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='order_items', to='orders.menuitem'),
+        ),
+        migrations.RunPython(create_sqlite_search_index, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.RunPython(fill_menu_items, migrations.RunPython.noop),
+    ]
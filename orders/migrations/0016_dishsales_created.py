@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_dish_sales(apps, schema_editor):
+    """Счетчики продаж блюд строятся по существующим заказам"""
+    Item = apps.get_model('orders', 'Item')
+    DishSales = apps.get_model('orders', 'DishSales')
+    rows = (
+        Item.objects.filter(menu_item__isnull=False)
+        .values('menu_item_id', day=TruncDate('order__created_at'), status=F('order__status'))
+        .annotate(portions=Sum('quantity'), total=Sum(F('price') * F('quantity')))
+        .order_by()
+    )
+    DishSales.objects.bulk_create(
+        (DishSales(menu_item_id=row['menu_item_id'], day=row['day'], status=row['status'],
+                   quantity=row['portions'], revenue=row['total'])
+         for row in rows.iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_menuitem_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'В ожидании'), ('ready', 'Готов'), ('paid', 'Оплачен')], max_length=16)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='orders.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status'], name='dish_sales_day_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'day', 'status'), name='dish_sales_unique')],
+            },
+        ),
+        migrations.RunPython(fill_dish_sales, migrations.RunPython.noop),
+    ]
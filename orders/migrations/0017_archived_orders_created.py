@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_dishsales_created'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('table_number', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'В ожидании'), ('ready', 'Готов'), ('paid', 'Оплачен')], default='paid', max_length=16)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('paid_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('item', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=7)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_order_items', to='orders.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+            ],
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -7,21 +9,214 @@ class User(AbstractUser):
 
 
 class Order(models.Model):
+    PENDING = 'pending'
+    READY = 'ready'
+    PAID = 'paid'
+
     STATUS_CHOICES = [
-        ('в ожидании', 'В ожидании'),
-        ('готов', 'Готов'),
-        ('оплачен', 'Оплачен'),
+        (PENDING, 'В ожидании'),
+        (READY, 'Готов'),
+        (PAID, 'Оплачен'),
     ]
 
+    # Прежние значения статуса, которые по-прежнему принимаются на вход
+    LEGACY_STATUSES = {
+        'в ожидании': PENDING,
+        'готов': READY,
+        'оплачен': PAID,
+    }
+
+    # Допустимые переходы между статусами: оплаченный заказ больше не меняется
+    ALLOWED_TRANSITIONS = {
+        PENDING: {READY, PAID},
+        READY: {PENDING, PAID},
+        PAID: set(),
+    }
+
     table_number = models.IntegerField()
-    status = models.CharField(max_length=100, choices=STATUS_CHOICES, default='В ожидании')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    paid_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Версия заказа увеличивается при каждом изменении заказа или его блюд
+    # и используется для ETag при условных запросах
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='order_status_id_idx'),
+            models.Index(fields=['table_number'], name='order_table_number_idx'),
+            models.Index(fields=['id'], condition=~models.Q(status='paid'), name='order_unpaid_idx'),
+        ]
 
     def __str__(self):
         return f'Заказ {self.pk}'
 
+    @classmethod
+    def normalize_status(cls, value):
+        """Функция приводит статус к коду из STATUS_CHOICES.
+        Принимаются как коды, так и прежние русские названия в любом регистре.
+        Для неизвестного значения возвращается None"""
+        value = (value or '').strip().lower()
+        if value in dict(cls.STATUS_CHOICES):
+            return value
+        return cls.LEGACY_STATUSES.get(value)
+
+    @classmethod
+    def status_change_error(cls, current, status):
+        """Функция возвращает текст ошибки, если заказ нельзя перевести
+        из статуса current в статус status (Order.ALLOWED_TRANSITIONS),
+        иначе None. Оставить статус прежним можно всегда"""
+        if current == status or status in cls.ALLOWED_TRANSITIONS.get(current, ()):
+            return None
+        labels = dict(cls.STATUS_CHOICES)
+        return f'Заказ нельзя перевести из статуса "{labels[current]}" в статус "{labels[status]}"'
+
+    def save(self, *args, **kwargs):
+        """Функция отмечает время оплаты заказа при переходе в статус 'оплачен'
+        и сбрасывает его, если заказ вернули в другой статус.
+        При изменении существующего заказа увеличивается его версия"""
+        changed_fields = {'updated_at'}
+        paid = self.status == self.PAID
+        if paid != (self.paid_at is not None):
+            self.paid_at = timezone.now() if paid else None
+            changed_fields.add('paid_at')
+        if not self._state.adding:
+            self.version += 1
+            changed_fields.add('version')
+        self.updated_at = timezone.now()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *changed_fields}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Функция запоминает общую стоимость и статус заказа, загруженные
+        из базы, чтобы при сохранении можно было вычислить изменение выручки
+        и определить, изменился ли статус"""
+        instance = super().from_db(db, field_names, values)
+        if 'total_price' in instance.__dict__:
+            instance._loaded_total_price = instance.total_price
+        if 'status' in instance.__dict__:
+            instance._loaded_status = instance.status
+        return instance
+
+
+class MenuItem(models.Model):
+    """Позиция меню. Цена позиции - текущая цена блюда,
+    в блюде заказа сохраняется цена на момент заказа"""
+    name = models.CharField(max_length=255, unique=True)
+    price = models.DecimalField(max_digits=7, decimal_places=2, default=0.00)
+
+    def __str__(self):
+        return self.name
+
 
 class Item(models.Model):
+    # Название блюда на момент заказа, по нему выполняется поиск
+    item = models.CharField(max_length=255)
+    # Цена одной порции на момент заказа
+    price = models.DecimalField(max_digits=7, decimal_places=2, default=0.00)
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    menu_item = models.ForeignKey('MenuItem', on_delete=models.PROTECT, related_name='order_items',
+                                  null=True, blank=True)
+    order = models.ForeignKey('Order', on_delete=models.CASCADE, related_name='items')
+
+
+class DishSales(models.Model):
+    """Счетчики продаж блюда меню за день (по дате создания заказа)
+    для заказов в одном статусе. Обновляются инкрементально при сохранении,
+    смене статуса и удалении заказов, поэтому рейтинг блюд за период
+    не пересчитывается по всей таблице блюд"""
+    menu_item = models.ForeignKey('MenuItem', on_delete=models.CASCADE, related_name='sales')
+    day = models.DateField()
+    status = models.CharField(max_length=16, choices=Order.STATUS_CHOICES)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'day', 'status'], name='dish_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'status'], name='dish_sales_day_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.menu_item} за {self.day}: {self.quantity} шт.'
+
+
+class ArchivedOrder(models.Model):
+    """Оплаченный заказ, перенесенный из рабочей таблицы заказов в архив
+    (orders.archive). Сохраняет id и все поля заказа; архивные заказы
+    не изменяются, но учитываются в выручке, продажах блюд и выгрузке"""
+    id = models.BigIntegerField(primary_key=True)
+    table_number = models.IntegerField()
+    status = models.CharField(max_length=16, choices=Order.STATUS_CHOICES, default=Order.PAID)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    created_at = models.DateTimeField(db_index=True)
+    paid_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'Архивный заказ {self.pk}'
+
+
+class ArchivedItem(models.Model):
+    """Блюдо архивного заказа"""
+    id = models.BigIntegerField(primary_key=True)
     item = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=7, decimal_places=2, default=0.00)
-    order = models.ForeignKey('Order', on_delete=models.CASCADE, related_name='items')
\ No newline at end of file
+    quantity = models.PositiveIntegerField(default=1)
+    menu_item = models.ForeignKey('MenuItem', on_delete=models.PROTECT, related_name='archived_order_items',
+                                  null=True, blank=True)
+    order = models.ForeignKey('ArchivedOrder', on_delete=models.CASCADE, related_name='items')
+
+
+class IdempotencyKey(models.Model):
+    """Ключ идемпотентности (заголовок Idempotency-Key или скрытое поле формы)
+    и ответ на первый запрос с этим ключом. Повторный запрос с тем же ключом
+    получает сохраненный ответ, не создавая заказ заново (orders.idempotency).
+    Ключи удаляются после expires_at"""
+    key = models.CharField(max_length=255)
+    # Хэш метода, пути и тела запроса: ключ нельзя использовать для другого запроса
+    fingerprint = models.CharField(max_length=64)
+    # Код ответа; пустой, пока первый запрос выполняется
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content = models.BinaryField(default=b'')
+    content_type = models.CharField(max_length=255, blank=True)
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.key}: {self.status_code}'
+
+
+class RevenueSummary(models.Model):
+    """Сводка выручки по всем заказам. Хранится в единственной строке
+    и обновляется инкрементально при создании, изменении и удалении заказов,
+    поэтому страница выручки не пересчитывает агрегаты по всей таблице"""
+    SINGLETON_ID = 1
+
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    amount_of_orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'Выручка {self.total_revenue} руб. за {self.amount_of_orders} заказов'
+
+    @property
+    def average_bill(self):
+        if not self.amount_of_orders:
+            return 0
+        return self.total_revenue / self.amount_of_orders
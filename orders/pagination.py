@@ -0,0 +1,94 @@
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+
+@dataclass
+class KeysetPage:
+    """Страница заказов, полученная постраничным выводом по ключу id"""
+    object_list: list = field(default_factory=list)
+    page_size: int = 0
+    has_newer: bool = False
+    has_older: bool = False
+
+    @property
+    def newer_cursor(self):
+        """id, после которого начинается страница с более новыми заказами"""
+        if self.has_newer and self.object_list:
+            return self.object_list[0].id
+        return None
+
+    @property
+    def older_cursor(self):
+        """id, до которого начинается страница с более старыми заказами"""
+        if self.has_older and self.object_list:
+            return self.object_list[-1].id
+        return None
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу id (keyset/cursor pagination).
+
+    В отличие от OFFSET, запрос каждой страницы выполняется по индексу
+    первичного ключа и не зависит от размера таблицы. Заказы выводятся
+    от новых к старым, навигация осуществляется параметрами
+    ?before=<id> (более старые) и ?after=<id> (более новые)"""
+
+    def __init__(self, queryset, page_size=None, max_page_size=None):
+        self.queryset = queryset
+        self.page_size = page_size or settings.ORDERS_PAGE_SIZE
+        self.max_page_size = max_page_size or settings.ORDERS_MAX_PAGE_SIZE
+
+    @staticmethod
+    def _get_int(params, name):
+        """Функция возвращает положительное целое значение параметра
+        запроса или None, если параметр не задан или некорректен"""
+        try:
+            value = int(params.get(name, ''))
+        except ValueError:
+            return None
+        return value if value > 0 else None
+
+    def get_page_size(self, params):
+        """Функция определяет размер страницы с учетом параметра ?limit="""
+        limit = self._get_int(params, 'limit')
+        if limit is None:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_page_query(self, params):
+        """Функция возвращает срез набора заказов для страницы (на одну
+        запись больше размера страницы, чтобы без дополнительного COUNT
+        определить наличие следующей страницы) и функцию, которая
+        строит из выбранных строк объект KeysetPage"""
+        page_size = self.get_page_size(params)
+        before = self._get_int(params, 'before')
+        after = self._get_int(params, 'after')
+
+        if after is not None and before is None:
+            def make_page(rows):
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+                rows.reverse()
+                return KeysetPage(rows, page_size, has_newer=has_more, has_older=True)
+
+            return self.queryset.filter(id__gt=after).order_by('id')[:page_size + 1], make_page
+
+        def make_page(rows):
+            has_more = len(rows) > page_size
+            return KeysetPage(rows[:page_size], page_size, has_newer=before is not None, has_older=has_more)
+
+        queryset = self.queryset.order_by('-id')
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        return queryset[:page_size + 1], make_page
+
+    def paginate(self, params):
+        """Функция возвращает страницу заказов для переданных параметров запроса"""
+        queryset, make_page = self.get_page_query(params)
+        return make_page(list(queryset))
+
+    async def apaginate(self, params):
+        """Асинхронный вариант paginate для асинхронных представлений"""
+        queryset, make_page = self.get_page_query(params)
+        return make_page([row async for row in queryset])
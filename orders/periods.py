@@ -0,0 +1,23 @@
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+def validate_period(date_from, date_to):
+    """Функция проверяет, что начало периода не позже его окончания.
+    Ошибка ValidationError Django выводится и формами, и сериализаторами DRF"""
+    if date_from and date_to and date_from > date_to:
+        raise ValidationError('Начало периода не может быть позже его окончания')
+
+
+def period_lookups(field, date_from=None, date_to=None):
+    """Функция возвращает условия filter() для поля даты и времени field,
+    отбирающие период с date_from по date_to включительно (в текущем часовом поясе).
+    Границы, равные None, не применяются"""
+    lookups = {}
+    if date_from:
+        lookups[f'{field}__gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to:
+        lookups[f'{field}__lt'] = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return lookups
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, F
+
+from .models import Order, ArchivedOrder, RevenueSummary
+
+
+# Показатели выручки, которые вычисляются агрегирующим запросом
+REVENUE_AGGREGATES = {
+    'total_revenue': Sum('total_price', default=0),
+    'amount_of_orders': Count('id'),
+}
+
+
+def combine_revenue(*totals):
+    """Функция складывает показатели выручки рабочей и архивной
+    таблиц заказов и вычисляет средний чек"""
+    total_revenue = sum((part['total_revenue'] for part in totals), Decimal('0.00'))
+    amount_of_orders = sum(part['amount_of_orders'] for part in totals)
+    return {
+        'total_revenue': total_revenue,
+        'amount_of_orders': amount_of_orders,
+        'average_bill': total_revenue / amount_of_orders if amount_of_orders else 0,
+    }
+
+
+def aggregate_revenue():
+    """Функция вычисляет общую выручку, количество заказов и средний чек
+    по рабочей и архивной таблицам заказов (по агрегирующему запросу к каждой)"""
+    return combine_revenue(
+        Order.objects.aggregate(**REVENUE_AGGREGATES),
+        ArchivedOrder.objects.aggregate(**REVENUE_AGGREGATES),
+    )
+
+
+def summary_to_revenue(summary):
+    return {
+        'total_revenue': summary.total_revenue,
+        'amount_of_orders': summary.amount_of_orders,
+        'average_bill': summary.average_bill,
+    }
+
+
+def get_revenue():
+    """Функция возвращает показатели выручки из сводной таблицы.
+    Если сводка еще не построена, показатели вычисляются одним запросом"""
+    summary = RevenueSummary.objects.filter(pk=RevenueSummary.SINGLETON_ID).first()
+    if summary is None:
+        return aggregate_revenue()
+    return summary_to_revenue(summary)
+
+
+async def aget_revenue():
+    """Асинхронный вариант get_revenue для асинхронных представлений"""
+    summary = await RevenueSummary.objects.filter(pk=RevenueSummary.SINGLETON_ID).afirst()
+    if summary is None:
+        return combine_revenue(
+            await Order.objects.aaggregate(**REVENUE_AGGREGATES),
+            await ArchivedOrder.objects.aaggregate(**REVENUE_AGGREGATES),
+        )
+    return summary_to_revenue(summary)
+
+
+def apply_revenue_delta(revenue, orders=0):
+    """Функция инкрементально изменяет сводку выручки на переданные величины.
+    Обновление выполняется выражениями F(), поэтому параллельные
+    изменения не теряются. Если сводка не построена, ничего не происходит"""
+    revenue = Decimal(revenue)
+    if not revenue and not orders:
+        return
+    RevenueSummary.objects.filter(pk=RevenueSummary.SINGLETON_ID).update(
+        total_revenue=F('total_revenue') + revenue,
+        amount_of_orders=F('amount_of_orders') + orders,
+    )
+
+
+def rebuild_revenue_summary():
+    """Функция заново строит сводку выручки по рабочей и архивной таблицам заказов.
+    Строка сводки блокируется на время пересчета, поэтому заказы,
+    сохраняемые параллельно, учитываются после завершения пересчета"""
+    with transaction.atomic():
+        summary, _ = RevenueSummary.objects.select_for_update().get_or_create(pk=RevenueSummary.SINGLETON_ID)
+        totals = aggregate_revenue()
+        summary.total_revenue = totals['total_revenue']
+        summary.amount_of_orders = totals['amount_of_orders']
+        summary.save()
+    return summary
@@ -0,0 +1,106 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Приложения, модели которых можно читать с реплик. Сессии и пользователи
+# всегда читаются с основной базы, куда они записываются
+REPLICA_APPS = {'orders'}
+
+# Можно ли читать с реплик в текущем контексте. Чтения разрешаются
+# только на время безопасных запросов (GET, HEAD, OPTIONS) клиентов,
+# которые недавно ничего не изменяли; вне запросов (команды, тесты,
+# фоновые задачи) все запросы идут в основную базу. Переменная контекста
+# передается и в потоки асинхронных представлений (sync_to_async)
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Контекстный менеджер, который разрешает (или запрещает)
+    чтение с реплик внутри блока"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_primary():
+    """Контекстный менеджер, который направляет все чтения внутри блока
+    в основную базу (например, чтобы прочитать только что записанное)"""
+    return use_replicas(False)
+
+
+class ReplicaRouter:
+    """Маршрутизатор баз данных: запись и миграции - в основную базу,
+    чтение моделей REPLICA_APPS - на случайную реплику из DATABASE_REPLICAS,
+    если чтения с реплик разрешены в текущем контексте"""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же базы, что и исходный объект
+            return instance._state.db
+        if not settings.DATABASE_REPLICAS or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in REPLICA_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Внутри транзакции чтения должны видеть ее же изменения
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Middleware, которое разрешает чтение с реплик на время безопасных
+    запросов. После изменяющего запроса клиент получает cookie и в течение
+    ORDERS_PRIMARY_PIN_SECONDS читает с основной базы, поэтому после
+    перенаправления видит свои изменения, даже если реплика отстает"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_replicas(self.reads_from_replicas(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        with use_replicas(self.reads_from_replicas(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def reads_from_replicas(self, request):
+        """Функция определяет, можно ли в запросе читать с реплик"""
+        if not settings.DATABASE_REPLICAS or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return False
+        return settings.ORDERS_PRIMARY_PIN_COOKIE not in request.COOKIES
+
+    def finish(self, request, response):
+        """Функция закрепляет клиента за основной базой после изменяющего запроса"""
+        if settings.DATABASE_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(settings.ORDERS_PRIMARY_PIN_COOKIE, '1',
+                                max_age=settings.ORDERS_PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
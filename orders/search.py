@@ -0,0 +1,107 @@
+import re
+
+from django.db import connections
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+
+from .models import Order, Item
+from .periods import period_lookups
+
+# Конфигурация полнотекстового поиска PostgreSQL для названий блюд
+# (должна совпадать с выражением индекса из миграции 0014)
+SEARCH_CONFIG = 'russian'
+
+# Индексы поиска (GIN-индексы PostgreSQL и таблица FTS5 с триггерами
+# в SQLite) создаются миграцией 0014_item_search_indexes_added
+
+
+def _postgresql_search(queryset, text):
+    """Поиск по названиям блюд в PostgreSQL: полнотекстовый поиск
+    с русской морфологией или триграммное сходство (опечатки, части слов).
+    Ранг заказа - лучший ранг среди его блюд"""
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    matching = Item.objects.annotate(
+        vector=SearchVector('item', config=SEARCH_CONFIG),
+    ).filter(Q(vector=query) | TrigramSimilar(F('item'), text))
+    rank = (
+        matching.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(rank=Max(SearchRank(F('vector'), query) + TrigramSimilarity('item', text)))
+        .values('rank')
+    )
+    return queryset.filter(id__in=matching.values('order_id')), Subquery(rank)
+
+
+def _sqlite_match_expression(text):
+    """Функция строит запрос FTS5: каждое слово ищется как префикс,
+    а все слова должны встретиться в названии одного блюда"""
+    words = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _sqlite_search(queryset, text):
+    """Поиск по названиям блюд в SQLite через индекс FTS5 по префиксам слов.
+    Ранг заказа - число подходящих блюд в нем"""
+    match = _sqlite_match_expression(text)
+    if not match:
+        return queryset.none(), None
+    matching_ids = RawSQL('SELECT rowid FROM orders_item_fts WHERE orders_item_fts MATCH %s', (match,))
+    matching = Item.objects.filter(id__in=matching_ids)
+    rank = (
+        matching.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(rank=Count('id'))
+        .values('rank')
+    )
+    return queryset.filter(id__in=matching.values('order_id')), Subquery(rank)
+
+
+def _default_search(queryset, text):
+    """Поиск по вхождению подстроки для остальных СУБД"""
+    matching = Item.objects.filter(item__icontains=text)
+    rank = (
+        matching.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(rank=Count('id'))
+        .values('rank')
+    )
+    return queryset.filter(id__in=matching.values('order_id')), Subquery(rank)
+
+
+SEARCH_BACKENDS = {
+    'postgresql': _postgresql_search,
+    'sqlite': _sqlite_search,
+}
+
+
+def search_orders(queryset=None, text=None, table_number=None, price_from=None, price_to=None,
+                  date_from=None, date_to=None, ranked=True):
+    """Функция отбирает заказы по названиям блюд (text), номеру стола,
+    диапазону стоимости заказа и периоду создания (date_from и date_to
+    включительно). Условия, равные None, не применяются.
+
+    При поиске по тексту с ranked=True заказы получают аннотацию rank
+    и упорядочиваются от более подходящих к менее подходящим,
+    иначе - от новых к старым"""
+    queryset = Order.objects.all() if queryset is None else queryset
+
+    if table_number is not None:
+        queryset = queryset.filter(table_number=table_number)
+    if price_from is not None:
+        queryset = queryset.filter(total_price__gte=price_from)
+    if price_to is not None:
+        queryset = queryset.filter(total_price__lte=price_to)
+    queryset = queryset.filter(**period_lookups('created_at', date_from, date_to))
+
+    text = (text or '').strip()
+    if not text:
+        return queryset.order_by('-id')
+
+    search = SEARCH_BACKENDS.get(connections[queryset.db].vendor, _default_search)
+    queryset, rank = search(queryset, text)
+    if not ranked or rank is None:
+        return queryset.order_by('-id')
+    return queryset.annotate(rank=rank).order_by('-rank', '-id')
@@ -0,0 +1,221 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import events
+from .dishes import new_dish_sales, collect_dish_sales, order_dish_sales, move_dish_sales, apply_dish_sales
+from .models import Order, Item, MenuItem
+from .revenue import apply_revenue_delta
+from .sql import delete_rows
+
+# Результаты пакетных операций для отдельных заказов
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+INVALID_TRANSITION = 'invalid_transition'
+
+
+class OrderVersionConflict(Exception):
+    """Заказ изменили после того, как клиент прочитал его версию.
+    current_version - текущая версия заказа (None, если заказ удален)"""
+
+    def __init__(self, order_id, expected_version, current_version):
+        super().__init__(f'Заказ {order_id} изменен: ожидалась версия {expected_version}, текущая {current_version}')
+        self.order_id = order_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def build_items(order, items_data):
+    """Функция превращает данные блюд (например, из API) в объекты Item.
+    Блюда с id, принадлежащие заказу, обновляются, остальные создаются заново.
+    Существующие блюда заказа загружаются одним запросом
+    (или берутся из prefetch_related, если он уже был выполнен)"""
+    existing_items = {item.id: item for item in order.items.all()} if order.pk else {}
+
+    items = []
+    for item_data in items_data:
+        item_data = dict(item_data)
+        item = existing_items.get(item_data.pop('id', None))
+        if item is None:
+            # Цена нового блюда без цены берется из меню (см. attach_menu_items)
+            item_data.setdefault('price', None)
+            item = Item(**item_data)
+        else:
+            if item_data.get('item', item.item) != item.item:
+                item.menu_item = None
+            for field, value in item_data.items():
+                setattr(item, field, value)
+        items.append(item)
+    return items
+
+
+def attach_menu_items(items):
+    """Функция связывает блюда без позиции меню (и блюда без цены)
+    с позициями по названию. Отсутствующие в меню блюда добавляются в него
+    с ценой из заказа, а блюда без цены получают текущую цену позиции меню.
+    Выполняется не больше трех запросов независимо от количества блюд"""
+    unlinked = [item for item in items if item.menu_item_id is None or item.price is None]
+    if not unlinked:
+        return items
+
+    names = {item.item for item in unlinked}
+    menu = {menu_item.name: menu_item for menu_item in MenuItem.objects.filter(name__in=names)}
+    prices = {item.item: item.price for item in unlinked if item.price is not None}
+    missing = [MenuItem(name=name, price=prices.get(name, 0)) for name in names - menu.keys()]
+    if missing:
+        # Позицию могли одновременно добавить в другом запросе, поэтому
+        # конфликты пропускаются, а созданные позиции читаются заново
+        MenuItem.objects.bulk_create(missing, ignore_conflicts=True)
+        menu.update((menu_item.name, menu_item)
+                    for menu_item in MenuItem.objects.filter(name__in=[menu_item.name for menu_item in missing]))
+
+    for item in unlinked:
+        item.menu_item = menu[item.item]
+        if item.price is None:
+            item.price = item.menu_item.price
+    return items
+
+
+def claim_order_version(order):
+    """Функция проверяет, что заказ в базе имеет версию order.version,
+    условным запросом UPDATE ... WHERE version = order.version.
+    Запрос блокирует строку заказа до конца транзакции, поэтому параллельное
+    изменение дождется ее завершения и получит конфликт, а пока пользователь
+    редактирует заказ, строка не блокируется. Если версия в базе другая,
+    вызывается OrderVersionConflict"""
+    claimed = Order.objects.filter(pk=order.pk, version=order.version).update(updated_at=timezone.now())
+    if not claimed:
+        current_version = Order.objects.filter(pk=order.pk).values_list('version', flat=True).first()
+        raise OrderVersionConflict(order.pk, order.version, current_version)
+
+
+def save_order(order, items=None, delete_missing=False):
+    """Функция сохраняет заказ вместе с блюдами в одной транзакции.
+
+    Новые блюда (без pk) создаются одним bulk_create, существующие
+    обновляются одним bulk_update, а при delete_missing=True блюда заказа,
+    которых нет в items, удаляются одним запросом. Блюда связываются
+    с позициями меню (attach_menu_items). Общая стоимость заказа - сумма
+    цен блюд с учетом количества порций - вычисляется заранее,
+    поэтому заказ сохраняется один раз. Счетчики продаж блюд
+    обновляются одним запросом (для существующего заказа его вклад
+    перечитывается до и после изменения).
+    Если items равен None, состав заказа и его стоимость не меняются.
+    Таким образом, число запросов не зависит от количества блюд.
+
+    Версия существующего заказа (order.version) - версия, на основе
+    которой внесены изменения (например, из скрытого поля формы).
+    Если заказ с тех пор изменили, вызывается OrderVersionConflict
+    и ничего не сохраняется (см. claim_order_version)"""
+    with transaction.atomic():
+        existing_items = [item for item in items or () if item.pk]
+        adding = order._state.adding
+        if not adding:
+            claim_order_version(order)
+        # Вклад существующего заказа в счетчики блюд пересчитывается,
+        # если меняется состав заказа или его статус
+        recount = not adding and (items is not None or getattr(order, '_loaded_status', None) != order.status)
+        sales = new_dish_sales()
+        if recount:
+            order_dish_sales([order.pk], sign=-1, sales=sales)
+
+        # Блюда удаляются одним запросом без изменения версии заказа
+        # (см. signals): новую версию записывает сохранение заказа
+        if items is not None and delete_missing and order.pk:
+            Item.objects.filter(order=order).exclude(id__in=[item.pk for item in existing_items]).delete()
+
+        if items is not None:
+            attach_menu_items(items)
+            order.total_price = sum((Decimal(item.price) * item.quantity for item in items), Decimal('0.00'))
+        order.save()
+
+        if items is not None:
+            new_items = []
+            for item in items:
+                item.order = order
+                if not item.pk:
+                    new_items.append(item)
+
+            if existing_items:
+                Item.objects.bulk_update(existing_items, ['item', 'price', 'quantity', 'menu_item'])
+            if new_items:
+                Item.objects.bulk_create(new_items)
+
+        if recount:
+            order_dish_sales([order.pk], sales=sales)
+        elif adding:
+            collect_dish_sales(sales, order, items or ())
+        apply_dish_sales(sales)
+
+    return order
+
+
+def change_status(order_ids, status):
+    """Функция переводит заказы в статус status одним запросом UPDATE.
+    Заказы блокируются на время проверки допустимости перехода
+    (Order.ALLOWED_TRANSITIONS), поэтому результат для каждого заказа точен.
+    Возвращает словарь {id заказа: результат}"""
+    order_ids = list(dict.fromkeys(order_ids))
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(id__in=order_ids).order_by('id').values_list('id', 'status')
+        )
+
+        results = {}
+        to_update = []
+        for order_id in order_ids:
+            if order_id not in current:
+                results[order_id] = NOT_FOUND
+            elif current[order_id] == status:
+                results[order_id] = UNCHANGED
+            elif Order.status_change_error(current[order_id], status):
+                results[order_id] = INVALID_TRANSITION
+            else:
+                results[order_id] = UPDATED
+                to_update.append(order_id)
+
+        if to_update:
+            sales = move_dish_sales(order_dish_sales(to_update), status)
+            now = timezone.now()
+            Order.objects.filter(id__in=to_update).update(
+                status=status,
+                paid_at=now if status == Order.PAID else None,
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            # UPDATE не отправляет сигналы, поэтому события публикуются явно
+            apply_dish_sales(sales)
+            for order_id in to_update:
+                events.publish(events.STATUS_CHANGED, order_id, status, previous_status=current[order_id])
+
+    return results
+
+
+def delete_orders(order_ids):
+    """Функция удаляет заказы вместе с блюдами. Заказы блокируются и читаются
+    одним запросом, после чего сводка выручки и счетчики продаж блюд
+    уменьшаются один раз на общий вклад заказов, а блюда и заказы удаляются
+    двумя запросами без сигналов моделей. События удаления публикуются явно,
+    поэтому число запросов не зависит от числа заказов.
+    Возвращает словарь {id заказа: результат}"""
+    order_ids = list(dict.fromkeys(order_ids))
+    with transaction.atomic():
+        existing = list(
+            Order.objects.select_for_update().filter(id__in=order_ids).order_by('id')
+            .values_list('id', 'status', 'total_price')
+        )
+        deleted_ids = [order_id for order_id, _, _ in existing]
+        if deleted_ids:
+            apply_dish_sales(order_dish_sales(deleted_ids, sign=-1))
+            apply_revenue_delta(-sum(total_price for _, _, total_price in existing), orders=-len(existing))
+            delete_rows(Item, 'order_id', deleted_ids)
+            delete_rows(Order, 'id', deleted_ids)
+            for order_id, status, _ in existing:
+                events.publish(events.DELETED, order_id, status)
+
+    deleted_ids = set(deleted_ids)
+    return {order_id: DELETED if order_id in deleted_ids else NOT_FOUND for order_id in order_ids}
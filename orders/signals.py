@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import events
+from .dishes import new_dish_sales, collect_dish_sales, order_dish_sales, apply_dish_sales
+from .models import Order, Item
+from .revenue import apply_revenue_delta
+
+
+@receiver(pre_save, sender=Order)
+def remember_total_price(sender, instance, update_fields=None, **kwargs):
+    """Функция загружает прежнюю стоимость заказа, если объект
+    был создан не из базы (например, Order(pk=...)), чтобы
+    корректно вычислить изменение выручки после сохранения"""
+    if instance.pk is None or hasattr(instance, '_loaded_total_price'):
+        return
+    if update_fields is not None and 'total_price' not in update_fields:
+        return
+    instance._loaded_total_price = (
+        Order.objects.filter(pk=instance.pk).values_list('total_price', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def update_revenue_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Функция учитывает в сводке выручки новый заказ
+    или изменение стоимости существующего"""
+    if created:
+        apply_revenue_delta(instance.total_price, orders=1)
+    elif update_fields is None or 'total_price' in update_fields:
+        previous = getattr(instance, '_loaded_total_price', None) or 0
+        apply_revenue_delta(Decimal(instance.total_price) - previous)
+    else:
+        return
+    instance._loaded_total_price = Decimal(instance.total_price)
+
+
+@receiver(post_delete, sender=Order)
+def update_revenue_on_delete(sender, instance, **kwargs):
+    """Функция исключает удаленный заказ из сводки выручки"""
+    apply_revenue_delta(-Decimal(instance.total_price), orders=-1)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def bump_item_order_version(sender, instance, origin=None, **kwargs):
+    """Функция увеличивает версию заказа, в котором было изменено
+    или удалено отдельное блюдо (Item.save() или Item.delete()).
+    При удалении набора блюд (QuerySet.delete, например в save_order,
+    который сам сохраняет заказ с новой версией) и при каскадном
+    удалении самого заказа версия не меняется"""
+    if isinstance(origin, (Order, QuerySet)):
+        return
+    Order.objects.filter(pk=instance.order_id).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Order)
+def publish_order_saved(sender, instance, created, **kwargs):
+    """Функция публикует событие создания, изменения или смены статуса заказа"""
+    previous_status = getattr(instance, '_loaded_status', None)
+    if created:
+        event_type = events.CREATED
+    elif previous_status is not None and previous_status != instance.status:
+        event_type = events.STATUS_CHANGED
+    else:
+        event_type = events.UPDATED
+    events.publish(event_type, instance.pk, instance.status, previous_status=previous_status,
+                   version=instance.version)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_deleted(sender, instance, **kwargs):
+    """Функция публикует событие удаления заказа"""
+    events.publish(events.DELETED, instance.pk, instance.status)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def publish_item_changed(sender, instance, origin=None, **kwargs):
+    """Функция публикует событие изменения заказа при изменении
+    или удалении отдельного блюда. Блюда, удаленные вместе с заказом
+    или набором в save_order (который сам публикует событие заказа), пропускаются"""
+    if origin is not None and not isinstance(origin, Item):
+        return
+    events.publish(events.UPDATED, instance.order_id)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_dish_sales(sender, instance, origin=None, **kwargs):
+    """Функция исключает удаляемые заказы из счетчиков продаж блюд,
+    пока их блюда еще не удалены. При удалении набора заказов
+    (QuerySet.delete) вклад всего набора вычисляется один раз"""
+    if isinstance(origin, QuerySet):
+        if getattr(origin, '_dish_sales_removed', False):
+            return
+        origin._dish_sales_removed = True
+        apply_dish_sales(order_dish_sales(origin.values('id'), sign=-1))
+    else:
+        apply_dish_sales(order_dish_sales([instance.pk], sign=-1))
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_dish_sales(sender, instance, origin=None, **kwargs):
+    """Функция исключает удаленное блюдо из счетчиков продаж блюд.
+    Блюда, удаленные вместе с заказом или набором в save_order
+    (который сам пересчитывает счетчики), пропускаются"""
+    if not isinstance(origin, Item) or instance.menu_item_id is None:
+        return
+    apply_dish_sales(collect_dish_sales(new_dish_sales(), instance.order, [instance], sign=-1))
@@ -0,0 +1,15 @@
+from django.db import connection
+
+
+def delete_rows(model, key, ids):
+    """Функция удаляет строки таблицы модели model, у которых столбец key
+    входит в ids, одним SQL-запросом DELETE без сигналов моделей
+    и без каскадного удаления: связанные строки удаляются вызывающим кодом.
+    Возвращает число удаленных строк"""
+    if not ids:
+        return 0
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(key)} IN ({placeholders})', list(ids))
+        return cursor.rowcount
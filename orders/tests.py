@@ -1,3 +1,982 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+
+from cafe_app.database import database_config, replica_databases
+
+from .analytics import revenue_breakdown
+from .archive import archive_orders
+from .cache import get_order_fragments
+from .dishes import rebuild_dish_sales, top_dishes
+from .export import export_orders
+from .importer import import_orders, load_checkpoint
+from .instrumentation import get_report, reset_report
+from .models import Order, Item, ArchivedOrder, MenuItem
+from .revenue import get_revenue, rebuild_revenue_summary
+from .routing import ReplicaRouter, ReplicaRoutingMiddleware
+from .services import change_status, delete_orders, save_order
+from . import urls
+from .views import OrdersView, OrderSearchView, RevenueView, AsyncOrdersView, AsyncOrderSearchView, \
+    AsyncRevenueView
+
+
+class OrderDetailsViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.order = Order.objects.create(table_number=4, total_price=350)
+        Item.objects.bulk_create([
+            Item(order=self.order, item='борщ', price=200),
+            Item(order=self.order, item='латте', price=150),
+        ])
+
+    def test_order_with_items_loaded_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('order_details', args=[self.order.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'борщ')
+        self.assertContains(response, 'латте')
+
+    def test_cached_order_loaded_in_one_query(self):
+        self.client.get(reverse('order_details', args=[self.order.pk]))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order_details', args=[self.order.pk]))
+
+        self.assertContains(response, 'борщ')
+
+    def test_unchanged_order_returns_304_in_one_query(self):
+        response = self.client.get(reverse('order_details', args=[self.order.pk]))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('order_details', args=[self.order.pk]), headers={'If-None-Match': response['ETag']},
+            )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_item_change_invalidates_etag(self):
+        etag = self.client.get(reverse('order_details', args=[self.order.pk]))['ETag']
+        self.order.items.first().delete()
+
+        response = self.client.get(reverse('order_details', args=[self.order.pk]), headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_card_rendered_from_stale_row_is_not_served_after_change(self):
+        # Отрисовка, прочитавшая заказ до фиксации изменения, кэширует карточку под прежней версией
+        stale = Order.objects.get(pk=self.order.pk)
+        save_order(self.order, [Item(item='чай', price=90)], delete_missing=True)
+        get_order_fragments('details', [stale], lambda orders: {order.pk: 'борщ' for order in orders})
+
+        response = self.client.get(reverse('order_details', args=[self.order.pk]))
+
+        self.assertContains(response, 'чай')
+        self.assertNotContains(response, 'борщ')
+
+    def test_missing_order_returns_404(self):
+        response = self.client.get(reverse('order_details', args=[self.order.pk + 1]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class OrdersIndexPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def create_orders(self, count):
+        return [save_order(Order(table_number=1), [Item(item='кофе', price=100)]).pk for _ in range(count)]
+
+    def page_ids(self, **params):
+        response = self.client.get(reverse('index'), params)
+        return [order.pk for order in response.context['page'].object_list]
+
+    def test_before_after_and_limit_navigation(self):
+        ids = self.create_orders(5)[::-1]
+
+        self.assertEqual(self.page_ids(limit=2), ids[:2])
+        self.assertEqual(self.page_ids(limit=2, before=ids[1]), ids[2:4])
+        self.assertEqual(self.page_ids(limit=2, before=ids[3]), ids[4:])
+        self.assertEqual(self.page_ids(limit=2, after=ids[2]), ids[:2])
+
+        page = self.client.get(reverse('index'), {'limit': 2, 'before': ids[1]}).context['page']
+        self.assertTrue(page.has_newer and page.has_older)
+        self.assertEqual((page.newer_cursor, page.older_cursor), (ids[2], ids[3]))
+
+    def test_page_costs_same_queries_for_any_table_size(self):
+        ids = self.create_orders(5)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'), {'before': ids[-1]})
+
+        ids = self.create_orders(60)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('index'), {'before': ids[-1]})
+        self.assertEqual(len(response.context['page'].object_list), settings.ORDERS_PAGE_SIZE)
+
+
+class OrderSearchViewTests(TestCase):
+
+    def setUp(self):
+        self.soup = Order.objects.create(table_number=2, total_price=350)
+        self.coffee = Order.objects.create(table_number=5, total_price=440)
+        Item.objects.create(order=self.soup, item='Борщ украинский', price=350)
+        Item.objects.bulk_create([
+            Item(order=self.coffee, item='Латте', price=220),
+            Item(order=self.coffee, item='латте большой', price=220),
+        ])
+
+    def test_search_by_dish_name_and_table(self):
+        response = self.client.get(reverse('search_orders'), {'q': 'латте', 'table_number': 5})
+
+        self.assertEqual(list(response.context['page'].object_list), [self.coffee])
+
+    def test_renamed_item_is_found_by_new_name(self):
+        item = self.soup.items.get()
+        item.item = 'латте'
+        item.save()
+
+        response = self.client.get(reverse('search_orders'), {'q': 'латте'})
+
+        self.assertEqual(response.context['page'].paginator.count, 2)
+
+
+class DishAnalyticsTests(TestCase):
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order(table_number=1)
+            save_order(order, [Item(item='кофе', price=150, quantity=2), Item(item='борщ', price=350)])
+
+    def test_top_dishes_read_in_one_query_regardless_of_history(self):
+        self.create_orders(2)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api_dish_analytics'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('dish_analytics'))
+
+        self.create_orders(50)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_dish_analytics'), {'rank_by': 'revenue'})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('dish_analytics'))
+
+        results = response.json()['results']
+        self.assertEqual([row['name'] for row in results], ['борщ', 'кофе'])
+        self.assertEqual(results[1]['quantity'], 104)
+
+    def test_counters_follow_status_changes_and_deletes(self):
+        self.create_orders(3)
+        first, second, third = Order.objects.order_by('id')
+
+        change_status([first.pk, second.pk], Order.PAID)
+        delete_orders([third.pk])
+
+        self.assertEqual([row['quantity'] for row in top_dishes(status=Order.PAID)], [4, 2])
+        self.assertEqual(top_dishes(status=Order.PENDING), [])
+
+
+class RevenueSummaryTests(TestCase):
+
+    def revenue(self):
+        revenue = get_revenue()
+        return revenue['total_revenue'], revenue['amount_of_orders']
+
+    def test_summary_follows_order_lifecycle_and_matches_rebuild(self):
+        rebuild_revenue_summary()
+        first = save_order(Order(table_number=1), [Item(item='кофе', price=100), Item(item='чай', price=50)])
+        second = save_order(Order(table_number=2), [Item(item='суп', price=200, quantity=2)])
+        third = save_order(Order(table_number=3), [Item(item='хлеб', price=10)])
+        self.assertEqual(self.revenue(), (560, 3))
+
+        # Изменение состава заказа через API
+        kept = first.items.get(item='кофе')
+        self.client.patch(reverse('order-detail', args=[first.pk]),
+                          {'items': [{'id': kept.pk, 'item': 'кофе', 'price': '120'}]},
+                          content_type='application/json')
+        self.assertEqual(self.revenue(), (530, 3))
+
+        # Оплата не меняет выручку, удаление исключает заказ из сводки
+        change_status([first.pk, second.pk], Order.PAID)
+        self.client.delete(reverse('order-detail', args=[third.pk]))
+        self.assertEqual(self.revenue(), (520, 2))
+        delete_orders([second.pk])
+        self.assertEqual(self.revenue(), (120, 1))
+
+        incremental = get_revenue()
+        rebuild_revenue_summary()
+        self.assertEqual(get_revenue(), incremental)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def route(self, request):
+        """Функция пропускает запрос через middleware и возвращает
+        базу, выбранную для чтения заказов, и ответ"""
+        databases = []
+
+        def view(request):
+            databases.append(ReplicaRouter().db_for_read(Order))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return databases[0], response
+
+    def test_safe_requests_read_from_replica_and_writes_pin_to_primary(self):
+        factory = RequestFactory()
+        database, _ = self.route(factory.get('/'))
+        self.assertEqual(database, 'replica')
+
+        database, response = self.route(factory.post('/order/create/'))
+        self.assertEqual(database, 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Order), 'default')
+
+        # Клиент, который только что изменил данные, читает с основной базы
+        factory.cookies = response.cookies
+        database, _ = self.route(factory.get('/'))
+        self.assertEqual(database, 'default')
+
+        # Вне запросов чтения идут в основную базу
+        self.assertEqual(ReplicaRouter().db_for_read(Order), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaLagTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_replica_card_is_not_served_to_pinned_client(self):
+        order = save_order(Order(table_number=3), [Item(item='борщ', price=200)])
+        # Строка заказа с блюдами в том виде, в каком ее еще отдает отстающая реплика
+        replica_order = Order.objects.get(pk=order.pk)
+        prefetch_related_objects([replica_order], 'items')
+
+        response = self.client.patch(reverse('order-detail', args=[order.pk]),
+                                     {'items': [{'item': 'латте', 'price': '150'}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.ORDERS_PRIMARY_PIN_COOKIE, response.cookies)
+
+        # Запрос другого клиента, читающего с реплики, кэширует карточку по отставшей строке
+        get_order_fragments('card', [replica_order], OrdersView.render_cards)
+
+        # Клиент, изменивший заказ, читает с основной базы и видит свое изменение
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'латте')
+        self.assertNotContains(response, 'борщ')
+
+
+class ArchiveTests(TestCase):
+
+    def test_archived_orders_leave_live_tables_but_stay_in_reports(self):
+        for table_number in range(1, 5):
+            save_order(Order(table_number=table_number), [Item(item='кофе', price=150, quantity=2)])
+        first, second, third, fourth = Order.objects.order_by('id')
+        change_status([first.pk, third.pk, fourth.pk], Order.PAID)
+        Order.objects.filter(pk__in=[first.pk, third.pk]).update(paid_at=timezone.now() - timedelta(days=40))
+        revenue = rebuild_revenue_summary()
+        dishes = top_dishes()
+
+        self.assertEqual(archive_orders(batch_size=1), 2)
+
+        self.assertEqual(list(Order.objects.values_list('id', flat=True).order_by('id')), [second.pk, fourth.pk])
+        self.assertEqual(ArchivedOrder.objects.get(pk=third.pk).items.get().quantity, 2)
+        self.assertEqual(self.client.get(reverse('order_details', args=[first.pk])).status_code, 404)
+
+        # Сводки не меняются при переносе и сохраняются при пересчете
+        self.assertEqual(get_revenue()['total_revenue'], revenue.total_revenue)
+        self.assertEqual(rebuild_revenue_summary().amount_of_orders, 4)
+        rebuild_dish_sales()
+        self.assertEqual(top_dishes(), dishes)
+
+        rows = list(export_orders('jsonl'))
+        self.assertEqual([json.loads(row)['id'] for row in rows], [first.pk, second.pk, third.pk, fourth.pk])
+
+
+class IdempotencyTests(TestCase):
+
+    def test_api_retry_replays_response_without_creating_order(self):
+        data = {'table_number': 3, 'items': [{'item': 'чай', 'price': '50', 'quantity': 2}]}
+        first = self.client.post(reverse('order-list'), data, content_type='application/json',
+                                 headers={'Idempotency-Key': 'tablet-1'})
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post(reverse('order-list'), data, content_type='application/json',
+                                     headers={'Idempotency-Key': 'tablet-1'})
+        # Повтор читает только сохраненный ответ
+        self.assertFalse([query for query in queries if 'orders_order' in query['sql'] or 'orders_item' in query['sql']])
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Item.objects.count(), 1)
+
+        other = self.client.post(reverse('order-list'), {**data, 'table_number': 4}, content_type='application/json',
+                                 headers={'Idempotency-Key': 'tablet-1'})
+        self.assertEqual(other.status_code, 422)
+
+    def test_form_resubmission_with_same_key_creates_one_order(self):
+        data = {
+            'idempotency_key': 'form-1', 'table_number': 5,
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 0,
+            'form-0-item': 'кофе', 'form-0-price': '100', 'form-0-quantity': 1,
+        }
+        for _ in range(2):
+            response = self.client.post(reverse('create_order'), data)
+            self.assertEqual((response.status_code, response['Location']), (302, reverse('index')))
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class OrderVersionConflictTests(TestCase):
+
+    def setUp(self):
+        self.order = save_order(Order(table_number=2), [Item(item='кофе', price=150)])
+        self.item = self.order.items.get()
+
+    def test_form_edit_of_stale_version_shows_conflict_with_merged_items(self):
+        version = self.order.version
+        # Пока официант редактирует заказ, кухня отмечает его готовым
+        change_status([self.order.pk], Order.READY)
+
+        response = self.client.post(reverse('update_order', args=[self.order.pk]), {
+            'status': Order.PENDING, 'version': version,
+            'form-TOTAL_FORMS': 2, 'form-INITIAL_FORMS': 1,
+            'form-0-id': self.item.pk, 'form-0-item': 'кофе', 'form-0-price': '150', 'form-0-quantity': 1,
+            'form-1-item': 'чай', 'form-1-price': '50', 'form-1-quantity': 2,
+        })
+
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'Заказ изменили', status_code=409)
+        self.assertContains(response, 'value="чай"', status_code=409)
+        self.assertEqual(response.context['order_form'].initial['version'], version + 1)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.total_price, self.order.items.count()), (Order.READY, 150, 1))
+
+    def test_api_update_of_stale_version_returns_409(self):
+        url = reverse('order-detail', args=[self.order.pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'version': self.order.version}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.patch(url, {'status': 'ready'}, content_type='application/json',
+                                     headers={'If-Match': etag})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], self.order.version + 1)
+
+        response = self.client.patch(url, {'status': 'ready', 'version': self.order.version}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['order']['status'], Order.PENDING)
+
+
+class ItemDeleteViewTests(TestCase):
+
+    def test_deleting_item_updates_order_total_and_counters(self):
+        MenuItem.objects.create(name='стейк', price=300)
+        rebuild_revenue_summary()
+        order = save_order(Order(table_number=1), [Item(item='стейк', price=300), Item(item='хлеб', price=5)])
+        steak = order.items.get(item='стейк')
+
+        response = self.client.post(reverse('delete_item', args=[steak.pk]))
+
+        self.assertRedirects(response, reverse('update_order', args=[order.pk]))
+        order.refresh_from_db()
+        self.assertEqual((order.total_price, order.version), (5, 2))
+        self.assertEqual(list(order.items.values_list('item', flat=True)), ['хлеб'])
+        self.assertEqual(get_revenue()['total_revenue'], 5)
+        self.assertEqual([dish['name'] for dish in top_dishes()], ['хлеб'])
+
+
+class StatusTransitionTests(TestCase):
+
+    def setUp(self):
+        self.order = save_order(Order(table_number=2, status=Order.PAID), [Item(item='кофе', price=150)])
+        self.item = self.order.items.get()
+
+    def test_api_cannot_move_paid_order_back(self):
+        response = self.client.patch(reverse('order-detail', args=[self.order.pk]), {'status': Order.PENDING},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.PAID)
+
+    def test_form_cannot_move_paid_order_back(self):
+        response = self.client.post(reverse('update_order', args=[self.order.pk]), {
+            'status': Order.PENDING, 'version': self.order.version,
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1,
+            'form-0-id': self.item.pk, 'form-0-item': 'кофе', 'form-0-price': '150', 'form-0-quantity': 1,
+        })
+
+        self.assertContains(response, 'Заказ нельзя перевести')
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.version), (Order.PAID, 1))
+
+
+class OrderUpdateQueriesTests(TestCase):
+
+    def create_order(self, items):
+        order = save_order(Order(table_number=1), [Item(item='кофе', price=100) for _ in range(items)])
+        kept = order.items.order_by('id').first()
+        return order, {'items': [{'id': kept.pk, 'item': 'кофе', 'price': '100'}]}
+
+    def test_removing_items_costs_same_queries_for_any_count(self):
+        order, data = self.create_order(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(reverse('order-detail', args=[order.pk]), data, content_type='application/json')
+
+        order, data = self.create_order(21)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.patch(reverse('order-detail', args=[order.pk]), data,
+                                         content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual((order.items.count(), order.total_price, order.version), (1, 100, 2))
+
+
+class OrderEventsTests(TestCase):
+
+    def test_events_are_refused_under_wsgi(self):
+        response = self.client.get(reverse('order_events'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+        self.assertNotContains(self.client.get(reverse('index')), 'EventSource')
+
+    async def test_index_subscribes_to_events_under_asgi(self):
+        response = await self.async_client.get(reverse('index'))
+        self.assertContains(response, 'EventSource')
+
+
+class BatchOperationsTests(TestCase):
+
+    def create_orders(self, count, status=Order.PENDING):
+        return [
+            save_order(Order(table_number=1, status=status), [Item(item='кофе', price=100), Item(item='чай', price=50)])
+            for _ in range(count)
+        ]
+
+    def batch(self, action, data):
+        return self.client.post(reverse(f'order-batch-{action}'), data, content_type='application/json')
+
+    def test_batch_status_reports_result_for_each_id(self):
+        pending, paid = self.create_orders(1) + self.create_orders(1, status=Order.PAID)
+
+        response = self.batch('status', {'ids': [pending.pk, paid.pk, paid.pk + 100], 'status': Order.READY})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'id': pending.pk, 'result': 'updated'},
+            {'id': paid.pk, 'result': 'invalid_transition'},
+            {'id': paid.pk + 100, 'result': 'not_found'},
+        ])
+        self.assertEqual(Order.objects.get(pk=paid.pk).status, Order.PAID)
+
+    def test_batch_delete_costs_same_queries_for_any_count(self):
+        rebuild_revenue_summary()
+        orders = self.create_orders(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.batch('delete', {'ids': [order.pk for order in orders]})
+
+        orders = self.create_orders(20)
+        missing = orders[-1].pk + 1
+        with self.assertNumQueries(len(queries)):
+            response = self.batch('delete', {'ids': [order.pk for order in orders] + [missing]})
+
+        self.assertEqual(response.json()['results'][-1], {'id': missing, 'result': 'not_found'})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Item.objects.exists())
+        revenue = get_revenue()
+        self.assertEqual((revenue['total_revenue'], revenue['amount_of_orders']), (0, 0))
+
+    @override_settings(ORDERS_BATCH_MAX_SIZE=2)
+    def test_filter_selecting_too_many_orders_is_rejected(self):
+        self.create_orders(3)
+
+        response = self.batch('delete', {'filter': {'status': Order.PENDING}})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class OrderExportViewTests(TestCase):
+
+    def setUp(self):
+        save_order(Order(table_number=2), [Item(item='борщ', price=200), Item(item='латте', price=150)])
+        save_order(Order(table_number=5, status=Order.PAID), [Item(item='чай', price=90)])
+
+    def test_csv_export_streams_order_items(self):
+        response = self.client.get(reverse('export_orders'), {'format': 'csv', 'status': Order.PAID})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].endswith(',чай,90.00,1'))
+
+    @override_settings(ORDERS_EXPORT_CHUNK_SIZE=1)
+    async def test_export_under_asgi_is_an_async_stream(self):
+        response = await self.async_client.get(reverse('export_orders'), {'format': 'jsonl'})
+
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        orders = [json.loads(line) for line in b''.join(lines).decode().splitlines()]
+        self.assertEqual([len(order['items']) for order in orders], [2, 1])
+
+    def test_invalid_format_is_rejected(self):
+        response = self.client.get(reverse('export_orders'), {'format': 'xml'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportOrdersTests(TestCase):
+
+    def record(self, price='100.00', quantity=1, table_number=1):
+        return {'table_number': table_number, 'items': [{'item': 'кофе', 'price': price, 'quantity': quantity}]}
+
+    def test_records_beyond_field_precision_are_rejected_individually(self):
+        records = [
+            self.record(),
+            self.record(price='123456.789'),
+            self.record(price='12.345'),
+            self.record(price='99999.99', quantity=10000),
+            self.record(table_number=2 ** 63),
+            self.record(price='50'),
+        ]
+
+        summary = import_orders(records, batch_size=10)
+
+        self.assertEqual([number for number, _ in summary['errors']], [2, 3, 4, 5])
+        self.assertEqual(summary['orders'], 2)
+        self.assertEqual(sorted(Order.objects.values_list('total_price', flat=True)), [50, 100])
+
+    def test_import_resumes_from_checkpoint(self):
+        records = [self.record(price=price) for price in ('10', '20', '30')]
+
+        def interrupt(summary):
+            raise KeyboardInterrupt
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'orders.checkpoint')
+            with self.assertRaises(KeyboardInterrupt):
+                import_orders(records, batch_size=2, checkpoint=checkpoint, on_batch=interrupt)
+
+            skip = load_checkpoint(checkpoint)
+            summary = import_orders(records, batch_size=2, skip=skip, checkpoint=checkpoint)
+
+        self.assertEqual(skip, 2)
+        self.assertEqual((summary['records'], summary['orders']), (3, 1))
+        self.assertEqual(sorted(Order.objects.values_list('total_price', flat=True)), [10, 20, 30])
+
+
+class OrderApiListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.orders = [
+            save_order(Order(table_number=number), [Item(item='кофе', price=100)]) for number in range(1, 6)
+        ]
+
+    def test_cursor_pages_follow_next_and_previous_links(self):
+        response = self.client.get(reverse('order-list'), {'limit': 2})
+        pages = [[order['id'] for order in response.json()['results']]]
+        self.assertEqual(response.json()['count'], 5)
+
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            pages.append([order['id'] for order in response.json()['results']])
+
+        ids = [order.pk for order in self.orders]
+        self.assertEqual(pages, [ids[:2], ids[2:4], ids[4:]])
+        previous = self.client.get(response.json()['previous']).json()
+        self.assertEqual([order['id'] for order in previous['results']], ids[2:4])
+
+    def test_fields_projection_returns_only_requested_fields_without_items(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('order-list'), {'fields': 'id,status'})
+
+        self.assertEqual(response.json()['results'][0], {'id': self.orders[0].pk, 'status': Order.PENDING})
+
+        response = self.client.get(reverse('order-list'), {'fields': 'id', 'include': 'items'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'items'})
+        self.assertEqual(self.client.get(reverse('order-list'), {'fields': 'id,secret'}).status_code, 400)
+
+    def test_count_false_skips_count_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-list'), {'fields': 'id', 'count': 'false'})
+
+        self.assertNotIn('count', response.json())
+        self.assertEqual(len(response.json()['results']), 5)
+
+
+class OrderFormMenuPriceTests(TestCase):
+
+    def setUp(self):
+        MenuItem.objects.create(name='борщ', price=100)
+
+    def post_order(self, *items):
+        data = {'table_number': 3, 'form-TOTAL_FORMS': len(items), 'form-INITIAL_FORMS': 0}
+        for number, (name, price) in enumerate(items):
+            data.update({f'form-{number}-item': name, f'form-{number}-price': price, f'form-{number}-quantity': 1})
+        return self.client.post(reverse('create_order'), data)
+
+    def test_new_item_form_has_no_default_price(self):
+        response = self.client.get(reverse('create_order'))
+
+        self.assertContains(response, '<input type="number" name="form-0-price" step="0.01" id="id_form-0-price">',
+                            html=True)
+        self.assertContains(response, 'min="1"')
+
+    def test_item_without_price_gets_menu_price(self):
+        response = self.post_order(('борщ', ''), ('латте', '150'))
+
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get()
+        self.assertEqual(sorted(order.items.values_list('item', 'price')), [('борщ', 100), ('латте', 150)])
+        self.assertEqual(order.total_price, 250)
+
+        # Блюда связываются с меню общими запросами, а не запросом на каждую форму
+        with CaptureQueriesContext(connection) as queries:
+            self.post_order(('борщ', ''), ('латте', ''))
+        with self.assertNumQueries(len(queries)):
+            self.post_order(*[('борщ', ''), ('латте', '')] * 5)
+
+    def test_unknown_item_without_price_is_rejected(self):
+        response = self.post_order(('суп дня', ''))
+
+        self.assertContains(response, 'Нет в меню, укажите цену: суп дня')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(MenuItem.objects.filter(name='суп дня').exists())
+
+
+class QueryInstrumentationTests(TestCase):
+
+    def setUp(self):
+        reset_report()
+        self.addCleanup(reset_report)
+        save_order(Order(table_number=1), [Item(item='кофе', price=150)])
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers_report_request_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+
+        self.assertEqual(response['X-View-Name'], 'index')
+        self.assertEqual(response['X-DB-Query-Count'], str(len(queries)))
+        self.assertIn('X-DB-Time-ms', response)
+        self.assertIn('X-Render-Time-ms', response)
+
+    def test_no_headers_without_debug(self):
+        response = self.client.get(reverse('index'))
+
+        self.assertNotIn('X-DB-Query-Count', response)
+
+    def test_report_accumulates_requests_by_route(self):
+        self.client.get(reverse('index'))
+        for _ in range(2):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('order-list'))
+
+        report = get_report()
+        self.assertEqual(sorted(report), ['index', 'order-list'])
+        self.assertEqual(report['order-list']['requests'], 2)
+        self.assertEqual(report['order-list']['max_queries'], len(queries))
+        self.assertIsNotNone(report['order-list']['slowest_query'])
+
+    def test_report_endpoint_is_staff_only(self):
+        self.client.get(reverse('index'))
+        url = reverse('api_instrumentation')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        user = get_user_model().objects.create_user('waiter', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['index']['requests'], 1)
+
+    def test_request_inside_execute_wrapper_block_keeps_wrapper_stack(self):
+        def outer(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(outer):
+            self.client.get(reverse('index'))
+            self.assertEqual(connection.execute_wrappers, [outer])
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class FastOrderRepresentationTests(TestCase):
+
+    def setUp(self):
+        MenuItem.objects.create(name='кофе', price=100)
+        self.orders = [
+            save_order(Order(table_number=1), [Item(item='кофе', price='99.90', quantity=2), Item(item='чай', price=5)]),
+            save_order(Order(table_number=2, status=Order.PAID), [Item(item='кофе', price=100)]),
+            save_order(Order(table_number=3), []),
+        ]
+
+    def get_json(self, url, fast):
+        cache.clear()
+        response = self.client.get(url, {'fast': fast})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_matches_serializer_output(self):
+        url = reverse('order-list')
+        self.assertEqual(self.get_json(url, 1), self.get_json(url, 0))
+
+    def test_retrieve_matches_serializer_output(self):
+        for order in self.orders:
+            url = reverse('order-detail', args=[order.pk])
+            self.assertEqual(self.get_json(url, 1), self.get_json(url, 0))
+
+
+class PeriodValidationTests(TestCase):
+
+    def test_reversed_period_is_rejected_by_forms_and_api(self):
+        period = {'date_from': '2025-03-02', 'date_to': '2025-03-01'}
+        for name in ('search_orders', 'revenue_analytics', 'dish_analytics'):
+            response = self.client.get(reverse(name), period)
+            self.assertContains(response, 'Начало периода не может быть позже его окончания')
+        for name in ('api_revenue_analytics', 'api_dish_analytics'):
+            response = self.client.get(reverse(name), period)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Начало периода не может быть позже его окончания']})
+
+
+class StatusNormalizationMigrationTests(TransactionTestCase):
+    before = [('orders', '0010_order_timestamps_added')]
+    after = [('orders', '0011_order_status_normalized')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_legacy_statuses_are_converted_to_codes_and_back(self):
+        HistoricalOrder = self.migrate(self.before).get_model('orders', 'Order')
+        for status in ('В ожидании', 'готов', ' Оплачен', 'неизвестно'):
+            HistoricalOrder.objects.create(table_number=1, status=status)
+
+        HistoricalOrder = self.migrate(self.after).get_model('orders', 'Order')
+        self.assertEqual(sorted(HistoricalOrder.objects.values_list('status', flat=True)),
+                         ['paid', 'pending', 'pending', 'ready'])
+
+        HistoricalOrder = self.migrate(self.before).get_model('orders', 'Order')
+        self.assertEqual(sorted(HistoricalOrder.objects.values_list('status', flat=True)),
+                         ['в ожидании', 'в ожидании', 'готов', 'оплачен'])
+
+
+class LegacyStatusFilterTests(TestCase):
+
+    def setUp(self):
+        self.paid = save_order(Order(table_number=1, status=Order.PAID), [])
+        self.pending = save_order(Order(table_number=2), [])
+
+    def test_index_filter_accepts_legacy_status_names(self):
+        for value in ('paid', 'оплачен', 'Оплачен'):
+            response = self.client.get(reverse('index'), {'status': value})
+            self.assertEqual([order.pk for order in response.context['page'].object_list], [self.paid.pk])
+            self.assertEqual(response.context['status_filter'], Order.PAID)
+
+    def test_api_accepts_legacy_status_names(self):
+        response = self.client.patch(reverse('order-detail', args=[self.pending.pk]), {'status': 'Готов'},
+                                     content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, Order.READY)
+        response = self.client.post(reverse('order-batch-status'), {'filter': {'status': 'готов'}, 'status': 'Оплачен'},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'status': Order.PAID,
+                                           'results': [{'id': self.pending.pk, 'result': 'updated'}]})
+
+
+class AsyncViewsTests(TestCase):
+
+    def setUp(self):
+        for table in range(1, 4):
+            save_order(Order(table_number=table), [Item(item='латте', price=220), Item(item='борщ', price=350)])
+        change_status([Order.objects.earliest('id').pk], Order.PAID)
+
+    async def get_responses(self, sync_view, async_view, data):
+        sync_response = await sync_to_async(sync_view.as_view())(RequestFactory().get('/', data))
+        async_response = await async_view.as_view()(AsyncRequestFactory().get('/', data))
+        return sync_response, async_response
+
+    async def test_async_index_matches_sync_view(self):
+        for data in ({}, {'status': Order.PAID}):
+            sync_response, async_response = await self.get_responses(OrdersView, AsyncOrdersView, data)
+            for key in ('page_order_ids', 'cards', 'status_filter'):
+                self.assertEqual(async_response.context_data[key], sync_response.context_data[key])
+
+    async def test_async_search_and_revenue_match_sync_views(self):
+        for sync_view, async_view, data in (
+                (OrderSearchView, AsyncOrderSearchView, {'q': 'латте', 'table_number': 2}),
+                (OrderSearchView, AsyncOrderSearchView, {'status': Order.PENDING}),
+                (RevenueView, AsyncRevenueView, {})):
+            sync_response, async_response = await self.get_responses(sync_view, async_view, data)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_response.content, sync_response.content)
+
+    def test_setting_switches_read_only_pages_to_async_views(self):
+        try:
+            for enabled, views in ((False, (OrdersView, OrderSearchView, RevenueView)),
+                                   (True, (AsyncOrdersView, AsyncOrderSearchView, AsyncRevenueView))):
+                with override_settings(ORDERS_ASYNC_VIEWS=enabled):
+                    importlib.reload(urls)
+                    clear_url_caches()
+                    resolved = [resolve(reverse(name, urlconf=urls), urlconf=urls).func.view_class
+                                for name in ('index', 'search_orders', 'revenue')]
+                    self.assertEqual(resolved, list(views))
+        finally:
+            importlib.reload(urls)
+            clear_url_caches()
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    base_dir = settings.BASE_DIR
+
+    def test_postgresql_defaults(self):
+        config = database_config(self.base_dir, env={})
+
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['NAME'], config['HOST'], config['PORT']), ('cafe', 'localhost', '5432'))
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS'], {'connect_timeout': 5})
+
+    def test_values_from_environment(self):
+        config = database_config(self.base_dir, env={
+            'DB_NAME': 'orders', 'DB_HOST': 'db', 'DB_CONN_MAX_AGE': '300',
+            'DB_CONN_HEALTH_CHECKS': 'no', 'DB_CONNECT_TIMEOUT': '2',
+        })
+
+        self.assertEqual((config['NAME'], config['HOST']), ('orders', 'db'))
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertFalse(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS']['connect_timeout'], 2)
+
+    def test_persistent_connections_disabled_under_asgi(self):
+        self.assertEqual(database_config(self.base_dir, env={'ASGI': '1'})['CONN_MAX_AGE'], 0)
+        self.assertEqual(database_config(self.base_dir, env={'ASGI': '1', 'DB_ENGINE': 'sqlite'})['CONN_MAX_AGE'], 0)
+        # Явно заданное значение важнее значения по умолчанию для ASGI
+        self.assertEqual(database_config(self.base_dir, env={'ASGI': '1', 'DB_CONN_MAX_AGE': '30'})['CONN_MAX_AGE'], 30)
+
+    def test_pool_replaces_persistent_connections(self):
+        config = database_config(self.base_dir, env={'DB_POOL': 'true', 'DB_CONN_MAX_AGE': '600', 'DB_POOL_MAX_SIZE': '20'})
+
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    def test_sqlite_config(self):
+        config = database_config(self.base_dir, env={'DB_ENGINE': 'sqlite'})
+
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], str(self.base_dir / 'db.sqlite3'))
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(database_config(self.base_dir, env={'DB_ENGINE': 'sqlite', 'DB_NAME': '/tmp/cafe.db'})['NAME'],
+                         '/tmp/cafe.db')
+
+    def test_unknown_engine(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DB_ENGINE: mysql'):
+            database_config(self.base_dir, env={'DB_ENGINE': 'mysql'})
+
+    def test_replicas_inherit_primary_settings(self):
+        replicas = replica_databases(self.base_dir, env={
+            'DB_REPLICAS': 'replica1, replica2', 'DB_NAME': 'cafe', 'DB_HOST': 'primary', 'DB_POOL': '1',
+            'DB_REPLICA1_HOST': 'replica-host', 'ASGI': '1',
+        })
+
+        self.assertEqual(list(replicas), ['replica1', 'replica2'])
+        self.assertEqual(replicas['replica1']['HOST'], 'replica-host')
+        self.assertEqual(replicas['replica2']['HOST'], 'primary')
+        for config in replicas.values():
+            self.assertEqual(config['NAME'], 'cafe')
+            self.assertEqual(config['CONN_MAX_AGE'], 0)
+            self.assertIn('pool', config['OPTIONS'])
+            self.assertEqual(config['TEST'], {'MIRROR': 'default'})
+
+    def test_no_replicas_by_default(self):
+        self.assertEqual(replica_databases(self.base_dir, env={}), {})
+
+
+class RevenueAnalyticsTests(TestCase):
+
+    def setUp(self):
+        created = [
+            (1, 100, datetime(2026, 3, 1, 9, 15)),
+            (2, 200, datetime(2026, 3, 1, 9, 40)),
+            (1, 300, datetime(2026, 3, 1, 18, 5)),
+            (3, 50, datetime(2026, 3, 2, 10, 0)),
+        ]
+        orders = []
+        for table_number, price, created_at in created:
+            order = save_order(Order(table_number=table_number), [Item(item='кофе', price=price)])
+            Order.objects.filter(pk=order.pk).update(created_at=created_at.replace(tzinfo=dt_timezone.utc))
+            orders.append(order)
+
+        # Первый заказ переносится в архив и должен учитываться в отчетах
+        change_status([orders[0].pk], Order.PAID)
+        Order.objects.filter(pk=orders[0].pk).update(paid_at=timezone.now() - timedelta(days=40))
+        archive_orders()
+
+    def rows(self, group_by, **period):
+        return [(row['bucket'], row['total_revenue'], row['amount_of_orders'])
+                for row in revenue_breakdown(group_by, **period)]
+
+    def test_breakdown_by_hour(self):
+        self.assertEqual(self.rows('hour'), [
+            (datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc), 300, 2),
+            (datetime(2026, 3, 1, 18, tzinfo=dt_timezone.utc), 300, 1),
+            (datetime(2026, 3, 2, 10, tzinfo=dt_timezone.utc), 50, 1),
+        ])
+
+    def test_breakdown_by_day_and_table(self):
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
+        self.assertEqual(self.rows('day'), [(date(2026, 3, 1), 600, 3), (date(2026, 3, 2), 50, 1)])
+        self.assertEqual(self.rows('table'), [(1, 400, 2), (2, 200, 1), (3, 50, 1)])
+        self.assertEqual([row['average_bill'] for row in revenue_breakdown('table')], [200, 200, 50])
+
+    def test_period_includes_both_dates(self):
+        self.assertEqual(self.rows('day', date_from=date(2026, 3, 2), date_to=date(2026, 3, 2)),
+                         [(date(2026, 3, 2), 50, 1)])
+        self.assertEqual(self.rows('table', date_to=date(2026, 3, 1)), [(1, 400, 2), (2, 200, 1)])
+
+    def test_api_endpoint(self):
+        response = self.client.get(reverse('api_revenue_analytics'), {'group_by': 'day', 'date_from': '2026-03-01'})
+
+        self.assertEqual(response.json(), {'group_by': 'day', 'results': [
+            {'bucket': '2026-03-01', 'total_revenue': '600.00', 'amount_of_orders': 3, 'average_bill': '200.00'},
+            {'bucket': '2026-03-02', 'total_revenue': '50.00', 'amount_of_orders': 1, 'average_bill': '50.00'},
+        ]})
+        self.assertEqual(self.client.get(reverse('api_revenue_analytics'), {'group_by': 'week'}).status_code, 400)
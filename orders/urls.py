@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import OrdersView, OrderDetailsView, OrderCreateView, OrderDeleteView, OrderUpdateView, OrderSearchView, \
-    RevenueView, ItemDeleteView
+    RevenueView, ItemDeleteView, RevenueAnalyticsView, OrderExportView, OrderEventsView, AsyncOrdersView, \
+    AsyncOrderSearchView, AsyncRevenueView, DishAnalyticsView
+
+# При ORDERS_ASYNC_VIEWS страницы, которые только читают данные,
+# обслуживаются асинхронными вариантами представлений
+if settings.ORDERS_ASYNC_VIEWS:
+    OrdersView, OrderSearchView, RevenueView = AsyncOrdersView, AsyncOrderSearchView, AsyncRevenueView
 
 urlpatterns = [
 path('', OrdersView.as_view(), name='index'),
@@ -12,4 +19,8 @@ path('order/<int:pk>/delete', OrderDeleteView.as_view(), name='delete_order'),
 path('order/item/<int:pk>/delete', ItemDeleteView.as_view(), name='delete_item'),
 path('search/', OrderSearchView.as_view(), name='search_orders'),
 path('revenue/', RevenueView.as_view(), name='revenue'),
+path('revenue/analytics/', RevenueAnalyticsView.as_view(), name='revenue_analytics'),
+path('dishes/', DishAnalyticsView.as_view(), name='dish_analytics'),
+path('export/', OrderExportView.as_view(), name='export_orders'),
+path('events/', OrderEventsView.as_view(), name='order_events'),
 ]
\ No newline at end of file
@@ -1,56 +1,147 @@
-from django.core.exceptions import PermissionDenied
-from django.db.models import Sum, Count, Avg
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db.models import prefetch_related_objects
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.forms import modelformset_factory
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.urls import reverse_lazy, reverse
-from django.views.generic import ListView, View, DeleteView
-
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.generic import ListView, View, DeleteView, DetailView
+
+from .analytics import revenue_breakdown
+from .cache import get_order_fragments
+from .conditional import make_etag
+from .dishes import top_dishes
+from .events import stream_events
+from .export import export_orders, aiter_export, FORMATS as EXPORT_FORMATS
+from .idempotency import idempotent, new_idempotency_key, IDEMPOTENCY_FIELD
 from .models import Order, Item
-from .forms import OrderForm, ItemForm, OrderSearchForm, OrderEditForm
+from .pagination import KeysetPaginator
+from .revenue import get_revenue, aget_revenue
+from .search import search_orders
+from .services import save_order, OrderVersionConflict
+from .forms import OrderForm, ItemForm, BaseItemFormSet, OrderSearchForm, OrderEditForm, RevenueAnalyticsForm, \
+    OrderExportForm, DishAnalyticsForm
 
 
 class OrdersView(ListView):
     template_name = "orders/index.html"
+    # Постраничный вывод по ключу; paginator_class ListView (Paginator Django)
+    # не используется, поэтому класс задан отдельным атрибутом
+    keyset_paginator_class = KeysetPaginator
 
     def get_queryset(self):
         """Функция получает набор данных для отображения.
-        Она получается объекты моделей Order, а также Item
-        с помощью метода prefetch_related.
+        Она получает объекты модели Order, блюда заказов
+        подгружаются только для заказов, отсутствующих в кэше.
         Встроена фильтрация заказов по статусу"""
 
         status_filter = self.request.GET.get('status', 'all')
 
         if status_filter == 'all' or not status_filter:
-            return Order.objects.prefetch_related('items').all()
+            return Order.objects.all()
         else:
-            return Order.objects.prefetch_related('items').filter(status=status_filter)
+            # Прежние русские названия статусов в ссылках тоже поддерживаются
+            status = Order.normalize_status(status_filter) or status_filter
+            return Order.objects.filter(status=status)
+
+    @staticmethod
+    def render_cards(orders):
+        """Функция отрисовывает карточки заказов, отсутствующих в кэше.
+        Блюда всех этих заказов загружаются одним запросом"""
+        prefetch_related_objects(orders, 'items')
+        return {order.pk: render_to_string('orders/order_card.html', {'order': order}) for order in orders}
+
+    def get_context_data(self, **kwargs):
+        """Функция выбирает из набора данных одну страницу заказов
+        и собирает ее из закэшированных карточек заказов.
+        Постраничный вывод выполняется по ключу id, поэтому
+        на каждую страницу приходится постоянное число запросов
+        независимо от количества заказов в базе"""
+        page = self.keyset_paginator_class(self.object_list).paginate(self.request.GET)
+        cards = get_order_fragments('card', page.object_list, self.render_cards)
+        return self.get_page_context(page, cards, **kwargs)
+
+    def get_page_context(self, page, cards, **kwargs):
+        """Функция собирает контекст шаблона из страницы заказов и их карточек"""
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context['cards'] = [cards[order.pk] for order in page.object_list]
+        context['page_order_ids'] = [order.pk for order in page.object_list]
+        context['page'] = page
+        context['status_choices'] = Order.STATUS_CHOICES
+        context['status_filter'] = Order.normalize_status(self.request.GET.get('status'))
+        context['events_available'] = events_available(self.request)
+        return context
+
+
+class AsyncOrdersView(OrdersView):
+
+    async def get(self, request, *args, **kwargs):
+        """Асинхронный вариант главной страницы: страница заказов
+        выбирается асинхронным запросом, а карточки, отсутствующие
+        в кэше, отрисовываются в потоке вместе с загрузкой блюд"""
+        self.object_list = self.get_queryset()
+        page = await self.keyset_paginator_class(self.object_list).apaginate(request.GET)
+        cards = await sync_to_async(get_order_fragments)('card', page.object_list, self.render_cards)
+        return self.render_to_response(self.get_page_context(page, cards))
+
+
+def get_request_order(request, pk):
+    """Функция загружает заказ один раз за запрос, чтобы проверка
+    ETag и само представление не выполняли отдельных запросов к базе"""
+    if not hasattr(request, '_order'):
+        request._order = Order.objects.filter(pk=pk).first()
+    return request._order
+
+
+def order_details_etag(request, pk):
+    order = get_request_order(request, pk)
+    return make_etag('details', order.pk, order.version) if order else None
 
 
-class OrderDetailsView(ListView):
+def order_details_last_modified(request, pk):
+    order = get_request_order(request, pk)
+    return order.updated_at if order else None
+
+
+@method_decorator(condition(etag_func=order_details_etag, last_modified_func=order_details_last_modified),
+                  name='dispatch')
+class OrderDetailsView(DetailView):
+    model = Order
     template_name = 'orders/order_details.html'
+    context_object_name = 'order'
 
-    def get_queryset(self):
-        """Функция получает набор данных для отображения.
-        Она получает объекты моделей Order, а также Item
-        с помощью метода prefetch_related.
-        Встроена фильтрация заказов по статусу"""
-        order = Order.objects.prefetch_related('items').get(pk=self.kwargs['pk'])
+    def get_object(self, queryset=None):
+        """Функция возвращает заказ, уже загруженный при проверке ETag.
+        Если версия заказа у клиента совпадает с текущей, ответ 304
+        возвращается без отрисовки страницы и без загрузки блюд"""
+        order = get_request_order(self.request, self.kwargs['pk'])
         if order is None:
-            raise PermissionDenied()
-        return Order.objects.filter(id=self.kwargs["pk"])
-
-    def get_context_data(self, *, object_list=None, **kwargs):
-        """Добавляет дополнительные данные в контекст шаблона.
-        В данном случае объект заказа добавляется в контекст,
-        чтобы его можно было использовать в шаблоне."""
-        context = super().get_context_data(object_list=object_list, **kwargs)
-        order = Order.objects.get(pk=self.kwargs["pk"])
-        context["order"] = order
+            raise Http404('Заказ не найден')
+        return order
+
+    def get_context_data(self, **kwargs):
+        """Добавляет в контекст шаблона сведения о заказе и его блюдах.
+        Они берутся из кэша, поэтому блюда загружаются
+        отдельным запросом только при промахе кэша"""
+        context = super().get_context_data(**kwargs)
+        order = self.object
+        context["order_card"] = get_order_fragments('details', [order], self.render_details)[order.pk]
         return context
 
+    @staticmethod
+    def render_details(orders):
+        """Функция отрисовывает сведения о заказах, отсутствующих в кэше"""
+        prefetch_related_objects(orders, 'items')
+        return {order.pk: render_to_string('orders/order_details_card.html', {'order': order}) for order in orders}
+
 
 class OrderCreateView(View):
-    ItemFormSet = modelformset_factory(Item, form=ItemForm)
+    ItemFormSet = modelformset_factory(Item, form=ItemForm, formset=BaseItemFormSet)
 
     def get(self, request, *args, **kwargs):
         """Функция для отображения формы создания заказа
@@ -59,42 +150,37 @@ class OrderCreateView(View):
         item_formset = self.ItemFormSet(queryset=Item.objects.none())
         return render(request, 'orders/create_order.html', {
             'order_form': order_form,
-            'item_formset': item_formset
+            'item_formset': item_formset,
+            'idempotency_key': new_idempotency_key(),
         })
 
+    @method_decorator(idempotent(form_field=IDEMPOTENCY_FIELD))
     def post(self, request, *args, **kwargs):
         """Функция для обработки формы создания заказа
-        и formset создания блюда для выполнения запроса POST"""
+        и formset создания блюда для выполнения запроса POST.
+        Повторная отправка формы с тем же ключом идемпотентности
+        (например, после обрыва связи) получает прежний ответ"""
         order_form = OrderForm(request.POST)
         item_formset = self.ItemFormSet(request.POST)
 
-        if order_form.is_valid():
+        if order_form.is_valid() and item_formset.is_valid():
             order = order_form.save(commit=False)
-            order.status = 'в ожидании'
-            order.save()
-
-            if item_formset.is_valid():
-                total_price = 0 # Переменная для расчета общей стоимости заказа
-                for item_form in item_formset:
-                    item = item_form.save(commit=False)
-                    if item:
-                        total_price += item.price
-                        item.order = order
-                        item.save()
-
-                order.total_price = total_price
-                order.save()
-                return redirect('index')
+            order.status = Order.PENDING
+            # Пустые формы блюд, которые пользователь не заполнял, пропускаются
+            items = [item_form.save(commit=False) for item_form in item_formset if item_form.has_changed()]
+            save_order(order, items)
+            return redirect('index')
 
         return render(request, 'orders/create_order.html', {
             'order_form': order_form,
-            'item_formset': item_formset
+            'item_formset': item_formset,
+            'idempotency_key': new_idempotency_key(),
         })
 
 
 class OrderUpdateView(View):
 
-    ItemFormSet = modelformset_factory(Item, form=ItemForm, extra=1)
+    ItemFormSet = modelformset_factory(Item, form=ItemForm, formset=BaseItemFormSet, extra=1)
 
     def get(self, request, order_id, *args, **kwargs):
         """Функция для отображения формы редактирования заказа
@@ -119,24 +205,61 @@ class OrderUpdateView(View):
         item_formset = self.ItemFormSet(request.POST, queryset=Item.objects.filter(order=order))
 
         if order_form.is_valid() and item_formset.is_valid():
-            order = order_form.save()
-            total_price = 0 # Переменная для расчета новой общей стоимости заказа
-            for item_form in item_formset:
-                item = item_form.save(commit=False)
-                if item:
-                    total_price += item.price
-                    item.order = order
-                    item.save()
-            order.total_price = total_price
-            order.save()
+            order = order_form.save(commit=False)
+            # Существующие блюда участвуют в расчете стоимости всегда,
+            # новые - только если форма была заполнена
+            items = [item_form.save(commit=False) for item_form in item_formset
+                     if item_form.instance.pk or item_form.has_changed()]
+            try:
+                save_order(order, items)
+            except OrderVersionConflict:
+                return self.render_conflict(request, order_id, order_form, item_formset)
             return redirect('index')
 
+        # Ошибки в блюдах могут быть вызваны изменением заказа (например,
+        # удалением блюда), поэтому при устаревшей версии показывается конфликт
+        if order_form.is_valid() and order_form.cleaned_data['version'] != order_form.initial['version']:
+            return self.render_conflict(request, order_id, order_form, item_formset)
+
         return render(request, 'orders/update_order.html', {
             'order_form': order_form,
             'item_formset': item_formset,
             'order': order
         })
 
+    def render_conflict(self, request, order_id, order_form, item_formset):
+        """Функция снова отображает форму, если заказ изменили, пока
+        пользователь его редактировал. Форма показывает текущий заказ
+        с новой версией, поверх которого перенесены изменения пользователя:
+        измененный статус, изменения блюд, которые еще есть в заказе
+        (по id), и новые блюда. Повторная отправка формы сохраняет их"""
+        def changes(form):
+            return {name: form.cleaned_data[name] for name in form.changed_data if name in form.cleaned_data}
+
+        order = get_object_or_404(Order, id=order_id)
+        # Изменения блюд, удаленных из заказа за это время, не переносятся
+        changed_items = {
+            item_form.instance.pk: changes(item_form)
+            for item_form in item_formset.initial_forms if item_form.instance.pk and item_form.has_changed()
+        }
+        new_items = [changes(item_form) for item_form in item_formset.extra_forms if item_form.has_changed()]
+
+        status = {name: value for name, value in changes(order_form).items() if name == 'status'}
+        order_form = OrderEditForm(instance=order, initial=status)
+        ItemFormSet = modelformset_factory(Item, form=ItemForm, formset=BaseItemFormSet,
+                                           extra=max(len(new_items), 1))
+        item_formset = ItemFormSet(queryset=Item.objects.filter(order=order), initial=new_items)
+        for item_form in item_formset.initial_forms:
+            item_form.initial.update(changed_items.get(item_form.instance.pk, {}))
+
+        return render(request, 'orders/update_order.html', {
+            'order_form': order_form,
+            'item_formset': item_formset,
+            'order': order,
+            'conflict': 'Заказ изменили, пока вы его редактировали. Проверьте текущий состав '
+                        'с вашими изменениями и сохраните заказ снова.',
+        }, status=409)
+
 
 class OrderDeleteView(DeleteView):
     model = Order
@@ -160,67 +283,197 @@ class ItemDeleteView(DeleteView):
 
     def get_queryset(self):
         """Функция получает набор данных для отображения
-        и последующего удаления. Она возвращает объекты моделей
-        Order, а также Item с помощью метода prefetch_related."""
-        items = Item.objects.all()
-        return items
+        и последующего удаления. Она возвращает блюда вместе с их заказами"""
+        return Item.objects.select_related('order')
+
+    def form_valid(self, form):
+        """Функция удаляет блюдо через save_order, чтобы вместе с составом
+        заказа изменились его стоимость, сводка выручки и счетчики продаж блюд.
+        Если заказ одновременно изменили, возвращается ответ 409"""
+        order = self.object.order
+        remaining = [item for item in order.items.all() if item.pk != self.object.pk]
+        try:
+            save_order(order, remaining, delete_missing=True)
+        except OrderVersionConflict:
+            return HttpResponse('Заказ изменили, обновите страницу', status=409)
+        return redirect(self.get_success_url())
 
 
 class OrderSearchView(View):
     template_name = 'orders/search_orders.html'
 
+    @staticmethod
+    def get_results(form):
+        """Функция возвращает набор заказов, отобранный по условиям
+        из формы (еще не выполненный). При поиске по названиям блюд
+        заказы упорядочены по рангу, иначе - от новых к старым"""
+        data = form.cleaned_data
+
+        filters = {}
+        if data.get('id'):
+            filters['id'] = data['id']
+        if data.get('status'):
+            filters['status'] = data['status']
+
+        return search_orders(
+            Order.objects.filter(**filters),
+            text=data.get('q'),
+            table_number=data.get('table_number'),
+            price_from=data.get('price_from'),
+            price_to=data.get('price_to'),
+            date_from=data.get('date_from'),
+            date_to=data.get('date_to'),
+        )
+
+    @staticmethod
+    def get_paginator(results):
+        return Paginator(results, settings.ORDERS_PAGE_SIZE)
+
     def get(self, request):
-        """Функция получает из формы id и status заказа,
-        а затем на их основе фильтрует данные, полученные из модели Order"""
+        """Функция получает из формы условия поиска, отбирает по ним
+        заказы и передает в шаблон одну страницу результатов (?page=)"""
         form = OrderSearchForm(request.GET or None)
-        results = []
-
+        page = None
         if form.is_valid():
-            order_id = form.cleaned_data.get('id')
-            status = form.cleaned_data.get('status')
+            page = self.get_paginator(self.get_results(form)).get_page(request.GET.get('page'))
+        return render(request, self.template_name, {'form': form, 'page': page})
 
-            filters = {}
-            if order_id:
-                filters['id'] = order_id
-            if status:
-                filters['status'] = status
 
-            results = Order.objects.filter(**filters)
+class AsyncOrderSearchView(OrderSearchView):
 
-        return render(request, self.template_name, {'form': form, 'results': results})
+    async def get(self, request):
+        """Асинхронный вариант поиска заказов: число результатов
+        и страница выбираются асинхронными запросами"""
+        form = OrderSearchForm(request.GET or None)
+        page = None
+        if form.is_valid():
+            paginator = self.get_paginator(self.get_results(form))
+            paginator.count = await paginator.object_list.acount()
+            page = paginator.get_page(request.GET.get('page'))
+            page.object_list = [order async for order in page.object_list]
+        return render(request, self.template_name, {'form': form, 'page': page})
 
 
 class RevenueView(View):
     template_name = 'orders/revenue.html'
 
-    def get_total_revenue(self):
-        """Функция вычисляет общую выручку, основываясь на данных
-        об общей стоимости заказов из модели Order"""
-        total_revenue = Order.objects.aggregate(total=Sum('total_price'))
-        return total_revenue['total'] if total_revenue['total'] else 0
-
-    def get_amount_of_orders(self):
-        """Функция считает количество заказов,
-        основываясь на данных из модели Order"""
-        amount_of_orders = Order.objects.aggregate(amount=Count('id'))
-        return amount_of_orders['amount'] if amount_of_orders['amount'] else 0
-
-    def get_average_bill(self):
-        """Функция вычисляет средний чек, основываясь на данных
-        об общей стоимости заказов из модели Order"""
-        average_bill = Order.objects.aggregate(avg=Avg('total_price', default=0))
-        return average_bill['avg'] if average_bill['avg'] else 0
-
     def get(self, request, *args, **kwargs):
         """Функция обновляет контекст, добавляя в него
         переменные total_revenue, amount_of_orders и average_bill,
-        и затем передает их в шаблон класса"""
-        total_revenue = self.get_total_revenue()
-        amount_of_orders = self.get_amount_of_orders()
-        average_bill = round(self.get_average_bill(), 2)
-        context = {
-            'total_revenue': total_revenue,
-            'amount_of_orders': amount_of_orders,
-            'average_bill': average_bill,
+        и затем передает их в шаблон класса.
+        Показатели читаются из сводки выручки одним запросом"""
+        return render(request, self.template_name, self.get_revenue_context(get_revenue()))
+
+    @staticmethod
+    def get_revenue_context(revenue):
+        return {
+            'total_revenue': revenue['total_revenue'],
+            'amount_of_orders': revenue['amount_of_orders'],
+            'average_bill': round(revenue['average_bill'], 2),
         }
-        return render(request, self.template_name, context)
+
+
+class AsyncRevenueView(RevenueView):
+
+    async def get(self, request, *args, **kwargs):
+        """Асинхронный вариант страницы выручки: сводка читается
+        асинхронным запросом (aget_revenue)"""
+        return render(request, self.template_name, self.get_revenue_context(await aget_revenue()))
+
+
+class RevenueAnalyticsView(View):
+    template_name = 'orders/revenue_analytics.html'
+
+    def get(self, request, *args, **kwargs):
+        """Функция получает из формы период и способ группировки
+        и передает в шаблон выручку, количество заказов и средний чек
+        по часам, дням или столам"""
+        form = RevenueAnalyticsForm(request.GET or None)
+        results = []
+        group_by = 'day'
+
+        if form.is_valid():
+            group_by = form.cleaned_data['group_by']
+            results = revenue_breakdown(group_by, form.cleaned_data['date_from'], form.cleaned_data['date_to'])
+        elif not form.is_bound:
+            results = revenue_breakdown(group_by)
+
+        return render(request, self.template_name, {'form': form, 'results': results, 'group_by': group_by})
+
+
+class DishAnalyticsView(View):
+    template_name = 'orders/dish_analytics.html'
+
+    def get(self, request, *args, **kwargs):
+        """Функция получает из формы период, статус и показатель рейтинга
+        и передает в шаблон самые продаваемые блюда. Рейтинг читается
+        из счетчиков продаж блюд одним запросом"""
+        form = DishAnalyticsForm(request.GET or None)
+        results = []
+
+        if form.is_valid():
+            results = top_dishes(
+                form.cleaned_data['date_from'],
+                form.cleaned_data['date_to'],
+                form.cleaned_data['status'],
+                form.cleaned_data['rank_by'],
+                form.cleaned_data['limit'],
+            )
+        elif not form.is_bound:
+            results = top_dishes()
+
+        return render(request, self.template_name, {'form': form, 'results': results})
+
+
+class OrderExportView(View):
+
+    def get(self, request, *args, **kwargs):
+        """Функция потоково выгружает заказы с блюдами в формате CSV
+        или JSON Lines с фильтрацией по статусу и диапазону id.
+        Заказы читаются пачками, поэтому память не растет с размером выгрузки.
+        Под ASGI строки отдаются асинхронным итератором, потому что
+        синхронный итератор Django собрал бы в список целиком перед отправкой"""
+        form = OrderExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+
+        export_format = form.cleaned_data['format']
+        rows = export_orders(
+            export_format,
+            status=form.cleaned_data['status'],
+            id_from=form.cleaned_data['id_from'],
+            id_to=form.cleaned_data['id_to'],
+        )
+        if isinstance(request, ASGIRequest):
+            rows = aiter_export(rows)
+        response = StreamingHttpResponse(rows, content_type=EXPORT_FORMATS[export_format][1])
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
+
+def events_available(request):
+    """Функция определяет, можно ли открыть поток событий: бесконечный
+    асинхронный поток работает только при запуске через ASGI, а при WSGI
+    он занял бы рабочий поток сервера навсегда"""
+    return isinstance(request, ASGIRequest)
+
+
+class OrderEventsView(View):
+
+    async def get(self, request, *args, **kwargs):
+        """Функция возвращает поток событий заказов (Server-Sent Events):
+        создание, изменение, смена статуса и удаление. Параметр ?status=
+        (можно указать несколько раз) ограничивает события статусами.
+        Поток работает только при запуске приложения через ASGI, при WSGI
+        возвращается ответ 204, после которого браузер не переподключается"""
+        if not events_available(request):
+            return HttpResponse(status=204)
+        statuses = {Order.normalize_status(status) for status in request.GET.getlist('status') if status != 'all'}
+        if None in statuses:
+            return HttpResponseBadRequest('Неизвестный статус')
+
+        return StreamingHttpResponse(
+            stream_events(statuses or None),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )